@@ -83,6 +83,15 @@ class Aircraft(object):
         out_parser.write()
 
 
+    def export_to_snapshot_file(self, out_file_path="Aircraft.snap", append=False):
+
+        from marilib.aircraft_data import snapshot
+        if append:
+            snapshot.append_snapshot(out_file_path, self)
+        else:
+            snapshot.write_snapshot(out_file_path, self)
+
+
     def get_data_dict(self):
 
         return get_data_dict(self, "Aircraft", {})
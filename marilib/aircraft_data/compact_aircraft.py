@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jan 24 23:22:21 2019
+
+@author: DRUOT Thierry
+
+Array backed representation of the aircraft data structure
+All data of all branches are stored in one float64 vector, branches are light views with one property per data
+so that aircraft.wing.area keeps working. Copy, snapshot and pickling are single buffer copies.
+"""
+
+import copy
+
+import numpy
+
+from marilib.aircraft_data.aircraft_description import Aircraft
+
+
+# Data that are written by the processes although they are not declared in their branch constructor
+extra_fields = (("environmental_impact","CO2_index"),
+                ("environmental_impact","sulfuric_acid_index"))
+
+# Kind of the value stored in each slot of the vector
+KIND_NONE = 0
+KIND_FLOAT = 1
+KIND_INT = 2
+KIND_OBJECT = 3
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+class CompactState(object):
+    """
+    Storage of all aircraft data
+    """
+    __slots__ = ("values","kinds","objects")
+
+    def __init__(self, n_field = 0):
+        """
+        Constructor :
+            :param values: Uu any - OoM any - Float64 vector of all numerical data, NaN where the data is not numerical
+            :param kinds: Uu int - OoM 10^0 - Kind of each data : 0 None, 1 float, 2 int, 3 object
+            :param objects: Uu dict - OoM 10^0 - Non numerical data (strings, tuples, arrays, booleans) by position
+        """
+        self.values = numpy.full(n_field,numpy.nan)
+        self.kinds = bytearray(n_field)
+        self.objects = {}
+
+    def copy(self):
+        state = CompactState.__new__(CompactState)
+        state.values = self.values.copy()
+        state.kinds = bytearray(self.kinds)
+        state.objects = copy.deepcopy(self.objects)
+        return state
+
+    def get(self,i):
+        kind = self.kinds[i]
+        if (kind==KIND_FLOAT):
+            return self.values[i]
+        elif (kind==KIND_NONE):
+            return None
+        elif (kind==KIND_INT):
+            return int(self.values[i])
+        else:
+            return self.objects[i]
+
+    def set(self,i,value):
+        if (value is None):
+            kind = KIND_NONE
+            self.values[i] = numpy.nan
+        elif isinstance(value,(float,numpy.floating)):
+            kind = KIND_FLOAT
+            self.values[i] = value
+        elif isinstance(value,(int,numpy.integer)) and not isinstance(value,(bool,numpy.bool_)) \
+             and abs(value)<=2**53:
+            kind = KIND_INT
+            self.values[i] = value
+        elif isinstance(value,numpy.ndarray) and value.ndim==0 and value.dtype.kind=="f":
+            kind = KIND_FLOAT
+            self.values[i] = value
+        else:
+            kind = KIND_OBJECT
+            self.values[i] = numpy.nan
+            self.objects[i] = value
+        if (kind!=KIND_OBJECT and self.kinds[i]==KIND_OBJECT):
+            del self.objects[i]
+        self.kinds[i] = kind
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+class FieldIndex(object):
+    """
+    Static position of every aircraft data in the state vector
+    """
+    def __init__(self, aircraft = None,
+                       extra = extra_fields):
+        """
+        Constructor :
+            :param aircraft: Uu Aircraft - OoM 10^0 - Data structure whose branches and data are indexed, a fresh Aircraft if None
+            :param extra: Uu list - OoM 10^0 - Additional (branch,data) couples
+        """
+        if (aircraft is None):
+            aircraft = Aircraft()
+
+        self.branches = {}
+        for branch_name,branch in aircraft.__dict__.items():
+            if hasattr(branch,"__dict__"):
+                self.branches[branch_name] = list(branch.__dict__.keys())
+
+        for branch_name,field_name in extra:
+            if field_name not in self.branches[branch_name]:
+                self.branches[branch_name].append(field_name)
+
+        self.fields = []
+        self.position = {}
+        for branch_name,field_names in self.branches.items():
+            for field_name in field_names:
+                self.position[branch_name+"."+field_name] = len(self.fields)
+                self.fields.append((branch_name,field_name))
+
+        self.views = {}
+        for branch_name,field_names in self.branches.items():
+            self.views[branch_name] = make_view_class(branch_name,field_names,self.position)
+
+    def __len__(self):
+        return len(self.fields)
+
+
+#===========================================================================================================
+def make_property(i):
+    """
+    Property reading and writing slot i of the state vector
+    """
+
+    def fget(view):
+        return view._state.get(i)
+
+    def fset(view,value):
+        view._state.set(i,value)
+
+    return property(fget,fset)
+
+
+#===========================================================================================================
+def make_view_class(branch_name,field_names,position):
+    """
+    Branch view class with one property per data, unknown data cannot be written
+    """
+
+    body = {"__slots__":("_state",)}
+    for field_name in field_names:
+        body[field_name] = make_property(position[branch_name+"."+field_name])
+
+    class_name = "".join([word.capitalize() for word in branch_name.split("_")]) + "View"
+
+    return type(class_name,(BranchView,),body)
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+class BranchView(object):
+    """
+    Base class of branch views
+    """
+    __slots__ = ()
+
+    def __init__(self, state = None):
+        """
+        Constructor :
+            :param state: Uu CompactState - OoM 10^0 - Shared storage of the aircraft
+        """
+        self._state = state
+
+
+# Index of the standard data structure, built once
+field_index = FieldIndex()
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+class CompactAircraft(object):
+    """
+    Array backed aircraft with the same attribute API as Aircraft
+    """
+    def __init__(self, name = None,
+                       index = None,
+                       state = None):
+        """
+        Constructor :
+            :param name: Uu any - OoM 10^0 - Aircraft name
+            :param index: Uu FieldIndex - OoM 10^0 - Field index, the standard one if None
+            :param state: Uu CompactState - OoM 10^0 - Data storage, a new one with all data set to None if None
+        """
+        if (index is None):
+            index = field_index
+        if (state is None):
+            state = CompactState(len(index))
+
+        object.__setattr__(self,"name",name)
+        object.__setattr__(self,"_index",index)
+        object.__setattr__(self,"_state",state)
+
+        for branch_name,view_class in index.views.items():
+            object.__setattr__(self,branch_name,view_class(state))
+
+    def __setattr__(self,name,value):
+        if (name in self._index.views):
+            raise Exception("CompactAircraft, branch "+name+" cannot be replaced")
+        object.__setattr__(self,name,value)
+
+    @classmethod
+    def from_aircraft(cls,aircraft,index=None):
+        """
+        Build a compact aircraft from a standard one
+        """
+        if (index is None):
+            index = field_index
+
+        compact = cls(aircraft.name,index)
+        state = compact._state
+
+        for branch_name,branch in aircraft.__dict__.items():
+            if not hasattr(branch,"__dict__"):
+                continue
+            for field_name,value in branch.__dict__.items():
+                key = branch_name+"."+field_name
+                if key not in index.position:
+                    raise Exception("CompactAircraft, data is not indexed : "+key)
+                state.set(index.position[key],value)
+
+        return compact
+
+    def to_aircraft(self):
+        """
+        Build a standard aircraft from the compact one
+        """
+        aircraft = Aircraft(self.name)
+
+        for i,(branch_name,field_name) in enumerate(self._index.fields):
+            setattr(getattr(aircraft,branch_name),field_name,self._state.get(i))
+
+        return aircraft
+
+    def snapshot(self):
+        """
+        Copy of the data storage
+        """
+        return self._state.copy()
+
+    def restore(self,state):
+        """
+        Overwrite all data with a snapshot, in place
+        """
+        self._state.values[:] = state.values
+        self._state.kinds[:] = state.kinds
+        self._state.objects.clear()
+        self._state.objects.update(copy.deepcopy(state.objects))
+
+    def copy(self):
+        return CompactAircraft(self.name,self._index,self._state.copy())
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self,memo):
+        return self.copy()
+
+    def __reduce__(self):
+        return (rebuild_compact_aircraft,(self.name,self._state.values,bytes(self._state.kinds),self._state.objects))
+
+    def get_data_dict(self):
+
+        data_dict = {"name":self.name}
+
+        for branch_name,field_names in self._index.branches.items():
+            view = getattr(self,branch_name)
+            data_dict[branch_name] = {field_name:getattr(view,field_name) for field_name in field_names}
+
+        return {"Aircraft":data_dict}
+
+
+#===========================================================================================================
+def rebuild_compact_aircraft(name,values,kinds,objects):
+    """
+    Unpickling of a compact aircraft built on the standard field index
+    """
+
+    state = CompactState.__new__(CompactState)
+    state.values = numpy.array(values, dtype=float)
+    state.kinds = bytearray(kinds)
+    state.objects = dict(objects)
+
+    return CompactAircraft(name,field_index,state)
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jan 24 23:22:21 2019
+
+@author: DRUOT Thierry
+
+Binary snapshot files of aircraft data
+A file is made of :
+    - a 24 bytes header : magic string, format version, schema size, number of columns, reserved
+    - a JSON schema listing the data paths, their type and their number of columns, padded to 8 bytes
+    - a payload of float64 little endian records, one record per aircraft, one column per numerical value
+Records are appended at the end of the file so that a whole database can be read with numpy.memmap
+None values are stored as NaN and NaN values are read back as None, aircraft names are not stored
+The schema does not depend on the stored aircraft so that any aircraft can be appended to any file
+"""
+
+import os
+import json
+import struct
+
+import numpy
+
+from marilib.aircraft_data.aircraft_description import Aircraft
+
+from marilib.aircraft_data.compact_aircraft import CompactAircraft, field_index
+
+
+magic = b"MARISNAP"
+
+version = 1
+
+header_format = "<8sIIII"
+
+header_size = struct.calcsize(header_format)
+
+payload_dtype = numpy.dtype("<f8")
+
+
+# Data stored as tuples : (type, length)
+tuple_fields = {"propulsion.rating_code":("int",5),
+                "turbofan_engine.rating_factor":("float",5)}
+
+# Scalar data that are codes or counts, all other scalar data are stored as float
+int_fields = ("low_speed.limitation",
+              "aerodynamics.hld_conf_clean",
+              "aerodynamics.hld_conf_ld",
+              "propulsion.architecture",
+              "propulsion.fuel_type",
+              "propulsion.bli_effect",
+              "center_of_gravity.cg_range_optimization",
+              "cabin.n_pax_ref",
+              "cabin.n_aisle",
+              "cabin.n_pax_front",
+              "wing.attachment",
+              "wing.morphing",
+              "wing.hld_type",
+              "horizontal_tail.attachment",
+              "turbofan_nacelle.attachment",
+              "turbofan_engine.n_engine",
+              "battery.strategy")
+
+
+#===========================================================================================================
+def make_schema():
+    """
+    Schema of the aircraft data : list of (path,type,size), built from field_index only
+    type is "float" or "int", size is 0 for scalar data and the length of the tuple for tuple data
+    """
+
+    schema = []
+
+    for branch_name,field_name in field_index.fields:
+        path = branch_name+"."+field_name
+        if path in tuple_fields:
+            kind,size = tuple_fields[path]
+            schema.append((path,kind,size))
+        elif path in int_fields:
+            schema.append((path,"int",0))
+        else:
+            schema.append((path,"float",0))
+
+    return schema
+
+
+#===========================================================================================================
+def n_column(schema):
+    """
+    Number of float64 values in one record
+    """
+
+    return sum([max(size,1) for path,kind,size in schema])
+
+
+#===========================================================================================================
+def aircraft_record(aircraft,schema):
+    """
+    Float64 record of an aircraft
+    """
+
+    record = numpy.full(n_column(schema),numpy.nan)
+
+    j = 0
+    for path,kind,size in schema:
+        branch_name,field_name = path.split(".")
+        value = getattr(getattr(aircraft,branch_name),field_name,None)
+        if (size==0):
+            if (value is not None and not isinstance(value,(int,float,numpy.integer,numpy.floating))) \
+               or isinstance(value,bool):
+                raise Exception("aircraft_record, data does not match the schema : "+path)
+            if (value is not None):
+                record[j] = value
+            j += 1
+        else:
+            if (value is not None):
+                if (not isinstance(value,tuple) or len(value)!=size):
+                    raise Exception("aircraft_record, data does not match the schema : "+path)
+                record[j:j+size] = value
+            j += size
+
+    return record
+
+
+#===========================================================================================================
+def record_aircraft(record,schema,compact=False):
+    """
+    Aircraft, or CompactAircraft, built from a float64 record
+    """
+
+    if compact:
+        aircraft = CompactAircraft()
+    else:
+        aircraft = Aircraft()
+
+    j = 0
+    for path,kind,size in schema:
+        branch_name,field_name = path.split(".")
+        if (size==0):
+            x = record[j]
+            if numpy.isnan(x):
+                value = None
+            elif (kind=="int"):
+                value = int(x)
+            else:
+                value = x
+            j += 1
+        else:
+            x = record[j:j+size]
+            if numpy.all(numpy.isnan(x)):
+                value = None
+            elif (kind=="int"):
+                value = tuple([int(v) for v in x])
+            else:
+                value = tuple([float(v) for v in x])
+            j += size
+        setattr(getattr(aircraft,branch_name),field_name,value)
+
+    return aircraft
+
+
+#===========================================================================================================
+def read_header(file_path):
+    """
+    Schema and payload offset of a snapshot file
+    """
+
+    with open(file_path,"rb") as file:
+        header = file.read(header_size)
+        if (len(header)<header_size):
+            raise Exception("read_header, file is too short : "+file_path)
+        file_magic,file_version,schema_size,file_n_column,reserved = struct.unpack(header_format,header)
+        if (file_magic!=magic):
+            raise Exception("read_header, not a snapshot file : "+file_path)
+        if (file_version>version):
+            raise Exception("read_header, unsupported snapshot version : "+str(file_version))
+        schema = [tuple(field) for field in json.loads(file.read(schema_size).decode("utf-8"))]
+
+    if (n_column(schema)!=file_n_column):
+        raise Exception("read_header, corrupted schema : "+file_path)
+
+    return schema,header_size+schema_size
+
+
+#===========================================================================================================
+def write_header(file,schema):
+    """
+    Write header and schema, schema is padded with spaces so that the payload is 8 bytes aligned
+    """
+
+    text = json.dumps(schema).encode("utf-8")
+    text += b" "*(-len(text)%8)
+
+    file.write(struct.pack(header_format,magic,version,len(text),n_column(schema),0))
+    file.write(text)
+
+    return
+
+
+#===========================================================================================================
+def write_snapshot(file_path,aircraft_list,schema=None):
+    """
+    Create or overwrite a snapshot file with one or several aircraft
+    The schema given by make_schema is used if not given
+    """
+
+    if isinstance(aircraft_list,(Aircraft,CompactAircraft)):
+        aircraft_list = [aircraft_list]
+
+    if (schema is None):
+        schema = make_schema()
+
+    with open(file_path,"wb") as file:
+        write_header(file,schema)
+        for aircraft in aircraft_list:
+            file.write(aircraft_record(aircraft,schema).astype(payload_dtype).tobytes())
+
+    return
+
+
+#===========================================================================================================
+def append_snapshot(file_path,aircraft_list):
+    """
+    Append one or several aircraft at the end of a snapshot file, the file is created if it does not exist
+    """
+
+    if not os.path.exists(file_path):
+        write_snapshot(file_path,aircraft_list)
+        return
+
+    if isinstance(aircraft_list,(Aircraft,CompactAircraft)):
+        aircraft_list = [aircraft_list]
+
+    schema,offset = read_header(file_path)
+
+    data = numpy.stack([aircraft_record(aircraft,schema) for aircraft in aircraft_list])
+
+    with open(file_path,"ab") as file:
+        file.write(data.astype(payload_dtype).tobytes())
+
+    return
+
+
+#===========================================================================================================
+def open_snapshot(file_path,mode="r"):
+    """
+    Schema and memory mapped payload of shape (number of records, number of columns)
+    Also returns the column of each scalar data path, tuple data map to their first column
+    """
+
+    schema,offset = read_header(file_path)
+
+    n_col = n_column(schema)
+    n_record = (os.path.getsize(file_path) - offset) // (n_col*payload_dtype.itemsize)
+
+    if (n_record==0):
+        payload = numpy.zeros((0,n_col), dtype=payload_dtype)
+    else:
+        payload = numpy.memmap(file_path, dtype=payload_dtype, mode=mode, offset=offset, shape=(n_record,n_col))
+
+    column = {}
+    j = 0
+    for path,kind,size in schema:
+        column[path] = j
+        j += max(size,1)
+
+    return schema,payload,column
+
+
+#===========================================================================================================
+def read_snapshot(file_path,records=None,compact=False):
+    """
+    List of aircraft stored in a snapshot file, records is a list of record numbers, all records if None
+    """
+
+    schema,payload,column = open_snapshot(file_path)
+
+    if (records is None):
+        records = range(payload.shape[0])
+
+    return [record_aircraft(numpy.array(payload[i]),schema,compact) for i in records]
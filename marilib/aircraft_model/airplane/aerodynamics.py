@@ -56,12 +56,11 @@ def high_lift(wing,hld_conf):
 
 
 #===========================================================================================================
-def drag(aircraft, pamb, tamb, mach, cz):
+def zero_lift_drag(aircraft, pamb, tamb, mach):
     """
-    Total aircraft drag with the assumption that the wing takes all the lift
+    Zero lift drag coefficient (friction, parasitic and tail cone drag), independent of the lift coefficient
     """
 
-    design_driver = aircraft.design_driver
     fuselage = aircraft.fuselage
     wing = aircraft.wing
     htp = aircraft.horizontal_tail
@@ -108,24 +107,157 @@ def drag(aircraft, pamb, tamb, mach, cz):
     #-----------------------------------------------------------------------------------------------------------
     aircraft_cx0 = aircraft_cxf + aircraft_cx_parasitic + fuse_cx_tapered
 
-    # Induced drag
-    #-----------------------------------------------------------------------------------------------------------
-    ki = ((fuselage.width / wing.span)**2 + 1.05 )  / (numpy.pi * wing.aspect_ratio)
-    aircraft_cxi = ki*cz**2  # Induced drag
+    return aircraft_cx0
 
-    # Compressibility drag
-    #-----------------------------------------------------------------------------------------------------------
-    # Freely inspired from Korn equation
-    cz_design = 0.5
-    aircraft_mach_div = 0.03 + design_driver.cruise_mach + 0.1*(cz_design-cz)
 
-    aircraft_cxc = 0.0025 * numpy.exp(40*(mach - aircraft_mach_div) )
+#--------------------------------------------------------------------------------------------------------------------------------
+class DragPolar(object):
+    """
+    Aircraft drag polar in given flight conditions (pamb, tamb, mach)
+    Zero lift drag is computed once, induced and compressibility drags are evaluated for each cz
+    """
+    def __init__(self, aircraft, pamb, tamb, mach):
+        """
+        Constructor :
+            :param aircraft: Aircraft whose geometry defines the polar
+            :param pamb: Uu Pa - Ambient pressure
+            :param tamb: Uu K - Ambient temperature
+            :param mach: Uu mach - Mach number
+        """
+        fuselage = aircraft.fuselage
+        wing = aircraft.wing
 
-    # Sum up
-    #-----------------------------------------------------------------------------------------------------------
-    aircraft_cx = aircraft_cx0 + aircraft_cxi + aircraft_cxc
+        self.mach = mach
+        self.cruise_mach = aircraft.design_driver.cruise_mach
+
+        self.cx0 = zero_lift_drag(aircraft, pamb, tamb, mach)
+
+        self.ki = ((fuselage.width / wing.span)**2 + 1.05 )  / (numpy.pi * wing.aspect_ratio)
+
+        self.lod_max_data = None
+
+    def drag(self, cz):
+        """
+        Total drag coefficient and lift to drag ratio, cz can be a numpy array
+        """
+        # Induced drag
+        #-----------------------------------------------------------------------------------------------------------
+        aircraft_cxi = self.ki*cz**2  # Induced drag
+
+        # Compressibility drag
+        #-----------------------------------------------------------------------------------------------------------
+        # Freely inspired from Korn equation
+        cz_design = 0.5
+        aircraft_mach_div = 0.03 + self.cruise_mach + 0.1*(cz_design-cz)
+
+        aircraft_cxc = 0.0025 * numpy.exp(40*(self.mach - aircraft_mach_div) )
+
+        # Sum up
+        #-----------------------------------------------------------------------------------------------------------
+        aircraft_cx = self.cx0 + aircraft_cxi + aircraft_cxc
+
+        aircraft_lod  = cz/aircraft_cx
+
+        return aircraft_cx, aircraft_lod
+
+    def lod_max(self):
+        """
+        Maximum lift to drag ratio and corresponding cz, computed once per polar
+        Flight conditions can be arrays, the Newton iterations are then done element wise
+        cx = cx0 + ki.cz^2 + kc.exp(4.cz), the optimum solves : cx0 - ki.cz^2 + kc.(1-4.cz).exp(4.cz) = 0
+        """
+        if (self.lod_max_data is None):
 
-    aircraft_lod  = cz/aircraft_cx
+            cz_design = 0.5
+            kc = 0.0025 * numpy.exp(40*(self.mach - 0.03 - self.cruise_mach - 0.1*cz_design))
+
+            cz = numpy.sqrt(self.cx0/self.ki)   # Optimum of the parabolic polar, upper bound of the solution
+
+            for i in range(20):
+                exp_cz = numpy.exp(4*cz)
+                res = self.cx0 - self.ki*cz**2 + kc*(1-4*cz)*exp_cz
+                dres = - 2*self.ki*cz - 16*kc*cz*exp_cz
+                dcz = res/dres
+                cz = cz - dcz
+                if (numpy.max(numpy.abs(dcz))<1.e-12):
+                    break
+
+            cx,lod = self.drag(cz)
+
+            if (0<numpy.ndim(cz) or (numpy.abs(dcz)<1.e-12 and 0.<lod)):
+                self.lod_max_data = (lod,cz)
+            else:
+                (cz,lod,rc) = maximize_1d(0.5,0.05,[lambda x:self.drag(x)[1]])      # Fallback on direct search
+                self.lod_max_data = (lod,cz)
+
+        return self.lod_max_data
+
+
+# Drag polars already built, indexed by geometry and flight conditions
+polar_cache = {}
+
+
+#===========================================================================================================
+def geometry_key(aircraft):
+    """
+    Tuple of all geometrical data the drag polar depends on
+    """
+
+    propulsion = aircraft.propulsion
+    fuselage = aircraft.fuselage
+    wing = aircraft.wing
+    htp = aircraft.horizontal_tail
+    vtp = aircraft.vertical_tail
+    nacelle = aircraft.turbofan_nacelle
+
+    key = (propulsion.architecture, aircraft.design_driver.cruise_mach,
+           fuselage.length, fuselage.width, fuselage.tail_cone_length, fuselage.net_wetted_area,
+           wing.area, wing.span, wing.aspect_ratio, wing.mac, wing.net_wetted_area,
+           htp.mac, htp.net_wetted_area, vtp.mac, vtp.net_wetted_area,
+           nacelle.length, nacelle.net_wetted_area)
+
+    if (propulsion.architecture==2):
+        e_nacelle = aircraft.electric_nacelle
+        key = key + (e_nacelle.length, e_nacelle.net_wetted_area, e_nacelle.hub_width)
+
+    return key
+
+
+#===========================================================================================================
+def drag_polar(aircraft, pamb, tamb, mach):
+    """
+    Drag polar in given flight conditions, built once and reused while geometry and conditions are unchanged
+    Conditions with several elements are not cached, size 1 arrays (fsolve unknowns) are cached as scalars
+    """
+
+    if (1<numpy.size(pamb) or 1<numpy.size(tamb) or 1<numpy.size(mach)):
+        return DragPolar(aircraft, pamb, tamb, mach)
+
+    pamb,tamb,mach = earth.as_float(pamb),earth.as_float(tamb),earth.as_float(mach)
+
+    key = (geometry_key(aircraft), pamb, tamb, mach)
+
+    polar = polar_cache.get(key)
+
+    if polar is None:
+        if (256<len(polar_cache)):
+            polar_cache.clear()
+        polar = DragPolar(aircraft, pamb, tamb, mach)
+        polar_cache[key] = polar
+
+    return polar
+
+
+#===========================================================================================================
+def drag(aircraft, pamb, tamb, mach, cz):
+    """
+    Total aircraft drag with the assumption that the wing takes all the lift
+    cz can be a numpy array, zero lift drag is computed once per flight condition
+    """
+
+    polar = drag_polar(aircraft, pamb, tamb, mach)
+
+    aircraft_cx, aircraft_lod = polar.drag(cz)
 
     return aircraft_cx, aircraft_lod
 
@@ -134,17 +266,33 @@ def drag(aircraft, pamb, tamb, mach, cz):
 def lod_max(aircraft,pamb,tamb,mach):
     """
     Maximum lift to drag ratio
+    Solved on the drag polar by Newton iterations, result is kept with the cached polar
+    """
+
+    polar = drag_polar(aircraft,pamb,tamb,mach)
+
+    lod_max,lod_max_cz = polar.lod_max()
+
+    return lod_max,lod_max_cz
+
+
+#===========================================================================================================
+def lod_max_1d(aircraft,pamb,tamb,mach):
+    """
+    Maximum lift to drag ratio by direct search
     """
 
     #=======================================================================================
-    def fct_lod_max(cz,aircraft,pamb,tamb,mach):
-        [cx,lod] = drag(aircraft,pamb,tamb,mach,cz)
+    def fct_lod_max(cz,polar):
+        [cx,lod] = polar.drag(cz)
         return lod
     #---------------------------------------------------------------------------------------
+    polar = drag_polar(aircraft,pamb,tamb,mach)
+
     cz_ini = 0.5
     dcz = 0.05
 
-    fct = [fct_lod_max, 1,aircraft,pamb,tamb,mach]
+    fct = [fct_lod_max, 1,polar]
     (lod_max_cz,lod_max,rc) = maximize_1d(cz_ini,dcz,fct)
 
     return lod_max,lod_max_cz
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jan 24 23:22:21 2019
+
+@author: DRUOT Thierry : original Scilab implementation
+         PETEILH Nicolas : portage to Python
+"""
+
+from marilib.airplane.airframe import airframe_design_grad as airframe_grad
+
+
+#===========================================================================================================
+def eval_system_mass_grad(aircraft,mtow,mtow_d):
+    """
+    Systems mass and its derivative with respect to characteristic weights
+    """
+
+    mass = 0.545*mtow**0.8    # global mass of all systems
+    mass_d = 0.436*mtow**(-0.2)*mtow_d
+
+    return mass,mass_d
+
+
+#===========================================================================================================
+def eval_aircraft_weights_grad(aircraft,mtow,mtow_d,mlw,mlw_d,mzfw,mzfw_d):
+    """
+    OWE and mass constraints with their derivatives with respect to characteristic weights
+    Masses that do not depend on MTOW, MLW and MZFW are taken from the aircraft, mass breakdown must have been run
+    """
+
+    cabin = aircraft.cabin
+    fuselage = aircraft.fuselage
+    payload = aircraft.payload
+    htp = aircraft.horizontal_tail
+    vtp = aircraft.vertical_tail
+    propulsion = aircraft.propulsion
+    battery = aircraft.battery
+
+    wing_mass,wing_mass_d = airframe_grad.eval_wing_mass_grad(aircraft,mtow,mtow_d,mzfw,mzfw_d)
+    ldg_mass,ldg_mass_d = airframe_grad.eval_landing_gear_mass_grad(aircraft,mtow,mtow_d,mlw,mlw_d)
+    systems_mass,systems_mass_d = eval_system_mass_grad(aircraft,mtow,mtow_d)
+
+    mwe =  cabin.m_furnishing + fuselage.mass + wing_mass + htp.mass + vtp.mass \
+         + ldg_mass + systems_mass + propulsion.mass
+    mwe_d = wing_mass_d + ldg_mass_d + systems_mass_d
+
+    owe = mwe + cabin.m_op_item + payload.m_container_pallet + battery.mass
+    owe_d = mwe_d
+
+    mass_constraint_1 = mzfw - (owe + payload.maximum)
+    mass_constraint_1_d = mzfw_d - owe_d
+
+    if (cabin.n_pax_ref>100 and 1.07*mzfw<mtow):
+        mass_constraint_2 = mlw - 1.07*mzfw
+        mass_constraint_2_d = mlw_d - 1.07*mzfw_d
+    else:
+        mass_constraint_2 = mlw - mtow
+        mass_constraint_2_d = mlw_d - mtow_d
+
+    return owe,owe_d, mass_constraint_1,mass_constraint_1_d, mass_constraint_2,mass_constraint_2_d
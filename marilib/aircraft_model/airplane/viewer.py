@@ -9,8 +9,6 @@ Created on Thu Jan 24 23:22:21 2019
 
 import numpy as np
 
-import matplotlib.pyplot as plt
-
 
 #===========================================================================================================
 def print_text(text,window_title,plot_title,x=0,y=0,fontsize=12):
@@ -18,6 +16,8 @@ def print_text(text,window_title,plot_title,x=0,y=0,fontsize=12):
     Print a text bloc on a figure
     """
 
+    import matplotlib.pyplot as plt
+
     n = len(text)
 
     fig = plt.figure(figsize=(5,n/3))
@@ -41,6 +41,8 @@ def draw_3d_view(aircraft,window_title,plot_title):
     Build a 3 viewx drawing of the airplane
     """
 
+    import matplotlib.pyplot as plt
+
     fus_width = aircraft.fuselage.width
     fus_height = aircraft.fuselage.height
     fus_length = aircraft.fuselage.length
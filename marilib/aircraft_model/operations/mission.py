@@ -24,39 +24,94 @@ def mission(aircraft,dist_range,tow,altp,mach,disa):
     Mission computation using breguet equation, fixed L/D and fixed sfc
     """
 
-    engine = aircraft.turbofan_engine
+    tas,lod_max,sfc,sec = mission_flight_condition(aircraft,altp,mach,disa)
+
+    return mission_fuel(aircraft,dist_range,tow,tas,lod_max,sfc,sec)
+
+
+#===========================================================================================================
+def mission_flight_condition(aircraft,altp,mach,disa):
+    """
+    Cruise data of the mission model : true air speed, maximum L/D, sfc and sec (None if not hybrid)
+    """
+
     propulsion = aircraft.propulsion
-    battery = aircraft.battery
 
     (MTO,MCN,MCL,MCR,FID) = propulsion.rating_code
 
-    g = earth.gravity()
-
     pamb,tamb,tstd,dtodz = earth.atmosphere(altp,disa)
     vsnd = earth.sound_speed(tamb)
     tas = vsnd*mach
 
     lod_max, cz_lod_max = airplane_aero.lod_max(aircraft, pamb, tamb, mach)
 
-    lod_cruise = 0.95 * lod_max
-
     nei = 0.
 
     sfc = propu.sfc(aircraft,pamb,tamb,mach,MCR,nei)
 
+    sec = None
+
     if (propulsion.architecture==2):
         fn,sec,data = propu.hybrid_thrust(aircraft,pamb,tamb,mach,MCR,nei)
     if (propulsion.architecture==3):
         fn,sec,data = propu.hybrid_thrust(aircraft,pamb,tamb,mach,MCR,nei)
 
-    # Departure ground phases
-    #-----------------------------------------------------------------------------------------------------------
+    return tas,lod_max,sfc,sec
+
+
+#===========================================================================================================
+def departure_ground_phases(aircraft,tow):
+    """
+    Fuel and time of taxi out and take off
+    """
+
+    engine = aircraft.turbofan_engine
+
     fuel_taxi_out = (34 + 2.3e-4*engine.reference_thrust)*engine.n_engine
     time_taxi_out = 540
 
     fuel_take_off = 1e-4*(2.8+2.3/engine.bpr)*tow
     time_take_off = 220*tow/(engine.reference_thrust*engine.n_engine)
 
+    return fuel_taxi_out,time_taxi_out,fuel_take_off,time_take_off
+
+
+#===========================================================================================================
+def arrival_ground_phases(aircraft,lw):
+    """
+    Fuel and time of landing and taxi in, lw is the landing weight
+    """
+
+    engine = aircraft.turbofan_engine
+
+    fuel_landing = 1e-4*(0.5+2.3/engine.bpr)*lw
+    time_landing = 180
+
+    fuel_taxi_in = (26 + 1.8e-4*engine.reference_thrust)*engine.n_engine
+    time_taxi_in = 420
+
+    return fuel_landing,time_landing,fuel_taxi_in,time_taxi_in
+
+
+#===========================================================================================================
+def mission_fuel(aircraft,dist_range,tow,tas,lod_max,sfc,sec):
+    """
+    Breguet mission from cruise data, see mission_flight_condition
+    All inputs but aircraft can be arrays of compatible shapes
+    """
+
+    engine = aircraft.turbofan_engine
+    propulsion = aircraft.propulsion
+    battery = aircraft.battery
+
+    g = earth.gravity()
+
+    lod_cruise = 0.95 * lod_max
+
+    # Departure ground phases
+    #-----------------------------------------------------------------------------------------------------------
+    fuel_taxi_out,time_taxi_out,fuel_take_off,time_take_off = departure_ground_phases(aircraft,tow)
+
     # Mission leg
     #-----------------------------------------------------------------------------------------------------------
     if (propulsion.architecture==1):
@@ -78,11 +133,7 @@ def mission(aircraft,dist_range,tow,altp,mach,disa):
 
     # Arrival ground phases
     #-----------------------------------------------------------------------------------------------------------
-    fuel_landing = 1e-4*(0.5+2.3/engine.bpr)*l_w
-    time_landing = 180
-
-    fuel_taxi_in = (26 + 1.8e-4*engine.reference_thrust)*engine.n_engine
-    time_taxi_in = 420
+    fuel_landing,time_landing,fuel_taxi_in,time_taxi_in = arrival_ground_phases(aircraft,l_w)
 
     # Block fuel and time
     #-----------------------------------------------------------------------------------------------------------
@@ -105,6 +156,117 @@ def mission(aircraft,dist_range,tow,altp,mach,disa):
     return block_fuel,time_block,fuel_total
 
 
+#===========================================================================================================
+def mission_vect(aircraft,dist_range,tow,altp,mach,disa):
+    """
+    Mission computation over arrays of cases, inputs are broadcast together
+    Cruise data are computed once per distinct (altp,mach,disa)
+    """
+
+    dist_range,tow,altp,mach,disa = numpy.broadcast_arrays(*[numpy.asarray(x, dtype=float)
+                                                           for x in (dist_range,tow,altp,mach,disa)])
+
+    conditions = numpy.stack((altp.ravel(),mach.ravel(),disa.ravel()), axis=1)
+
+    unique_conditions,inverse = numpy.unique(conditions, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+
+    n = len(unique_conditions)
+
+    tas = numpy.zeros(n)
+    lod_max = numpy.zeros(n)
+    sfc = numpy.zeros(n)
+    sec = numpy.zeros(n)
+
+    for j,(altp_j,mach_j,disa_j) in enumerate(unique_conditions):
+        tas[j],lod_max[j],sfc[j],sec_j = mission_flight_condition(aircraft,altp_j,mach_j,disa_j)
+        if (sec_j is not None):
+            sec[j] = sec_j
+
+    shape = dist_range.shape
+
+    return mission_fuel(aircraft,dist_range,tow,tas[inverse].reshape(shape),lod_max[inverse].reshape(shape),
+                        sfc[inverse].reshape(shape),sec[inverse].reshape(shape))
+
+
+#===========================================================================================================
+def breguet_factors(aircraft,altp,mach,disa):
+    """
+    Flight condition constants of the mission model, see mission()
+    With k_range = 1-exp(-range_factor*range), total fuel writes :
+        fuel_total = (tow*k_range - battery_fuel)*mission_factor + tow*reserve_factor
+    """
+
+    propulsion = aircraft.propulsion
+    battery = aircraft.battery
+
+    g = earth.gravity()
+
+    tas,lod_max,sfc,sec = mission_flight_condition(aircraft,altp,mach,disa)
+
+    lod_cruise = 0.95 * lod_max
+
+    if (propulsion.architecture==1):
+        battery_fuel = 0.
+    elif (propulsion.architecture==2):
+        battery_fuel = (sfc/sec)*battery.energy_cruise
+    elif (propulsion.architecture==3):
+        battery_fuel = (sfc/sec)*battery.energy_cruise
+    elif (propulsion.architecture==4):
+        battery_fuel = 0.
+    else:
+        raise Exception("propulsion.architecture index is out of range")
+
+    range_factor = (sfc*g)/(tas*lod_cruise)
+
+    # Diversion and holding fuels are proportional to landing weight : l_w = tow - fuel_mission
+    reserve_factor = (1-numpy.exp(-range_factor*regul.diversion_range())) + sfc*(g/lod_max)*regul.holding_time()
+
+    design_range = aircraft.design_driver.design_range
+
+    mission_factor = 1 + regul.reserve_fuel_ratio(design_range) - reserve_factor
+
+    return range_factor,mission_factor,reserve_factor,battery_fuel
+
+
+#===========================================================================================================
+def breguet_tow(aircraft,payload,dist_range,altp,mach,disa):
+    """
+    Take off weight of a mission, closed form inversion of mission()
+    payload and dist_range can be arrays, result is NaN where there is no solution
+    """
+
+    weights = aircraft.weights
+
+    range_factor,mission_factor,reserve_factor,battery_fuel = breguet_factors(aircraft,altp,mach,disa)
+
+    k_range = 1 - numpy.exp(-range_factor*numpy.asarray(dist_range))
+
+    den = 1 - k_range*mission_factor - reserve_factor
+
+    tow = (weights.owe + payload - battery_fuel*mission_factor)/numpy.where(0<den,den,numpy.nan)
+
+    return numpy.where(0<tow,tow,numpy.nan)[()]
+
+
+#===========================================================================================================
+def breguet_range(aircraft,tow,total_fuel,altp,mach,disa):
+    """
+    Range of a mission burning a given total fuel, closed form inversion of mission()
+    tow and total_fuel can be arrays, result is NaN where there is no solution
+    """
+
+    range_factor,mission_factor,reserve_factor,battery_fuel = breguet_factors(aircraft,altp,mach,disa)
+
+    k_range = ((numpy.asarray(total_fuel) - tow*reserve_factor)/mission_factor + battery_fuel)/tow
+
+    valid = k_range<1.
+
+    dist_range = -numpy.log(1 - numpy.where(valid,k_range,0.))/range_factor
+
+    return numpy.where(valid,dist_range,numpy.nan)[()]
+
+
 #===========================================================================================================
 def specific_air_range(aircraft,altp,mass,mach,disa):
 
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jan 24 23:22:21 2019
+
+@author: DRUOT Thierry : original Scilab implementation
+         PETEILH Nicolas : portage to Python
+"""
+
+import numpy
+
+from marilib.aircraft_model.operations import mission as perfo
+
+
+#===========================================================================================================
+def mission_grad(aircraft,dist_range,tow,tow_d,altp,mach,disa):
+    """
+    Mission computation of mission.mission with derivatives with respect to take off weight only
+    At fixed flight condition, all results of mission.mission_fuel are affine functions of tow,
+    derivatives are the differences of the results computed for tow = 1 and tow = 0
+    """
+
+    tas,lod_max,sfc,sec = perfo.mission_flight_condition(aircraft,altp,mach,disa)
+
+    block_fuel,time_block,fuel_total = perfo.mission_fuel(aircraft,dist_range,numpy.array([tow,1.,0.]),
+                                                          tas,lod_max,sfc,sec)
+
+    block_fuel_d = (block_fuel[1]-block_fuel[2])*tow_d
+    time_block_d = (time_block[1]-time_block[2])*tow_d
+    fuel_total_d = (fuel_total[1]-fuel_total[2])*tow_d
+
+    #-----------------------------------------------------------------------------------------------------------
+    return block_fuel[0],block_fuel_d, time_block[0],time_block_d, fuel_total[0],fuel_total_d
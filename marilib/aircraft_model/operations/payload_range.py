@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jan 24 23:22:21 2019
+
+@author: DRUOT Thierry
+
+Payload - Range diagrams computed in batch on top of the Breguet mission model
+"""
+
+import numpy
+
+from marilib.aircraft_model.operations import mission as perfo
+
+
+#===========================================================================================================
+def payload_range_points(aircraft,tow,total_fuel,altp,mach,disa):
+    """
+    Missions defined by take off weight and total fuel, tow and total_fuel can be arrays
+    Returns range, payload, block fuel and block time arrays, range is NaN where there is no solution
+    """
+
+    weights = aircraft.weights
+
+    tow = numpy.asarray(tow, dtype=float)
+    total_fuel = numpy.asarray(total_fuel, dtype=float)
+
+    dist_range = perfo.breguet_range(aircraft,tow,total_fuel,altp,mach,disa)
+
+    block_fuel,block_time,fuel = perfo.mission(aircraft,dist_range,tow,altp,mach,disa)
+
+    payload = tow - weights.owe - fuel
+
+    return dist_range,payload,block_fuel,block_time
+
+
+#===========================================================================================================
+def payload_range_envelope(aircraft,altp,mach,disa,n_point=50):
+    """
+    Payload - Range envelope made of three segments of n_point points each :
+        - maximum payload, from zero range up to MTOW
+        - MTOW, trading payload for fuel up to maximum fuel
+        - maximum fuel, from maximum fuel payload down to zero payload
+    Returns range, payload, tow, total fuel, block fuel and block time arrays of size 3*n_point
+    """
+
+    weights = aircraft.weights
+
+    payload_max = aircraft.payload.maximum
+
+    # Maximum payload segment, tow grows with range from zero range tow up to MTOW
+    #-----------------------------------------------------------------------------------------------------------
+    tow_min = perfo.breguet_tow(aircraft,payload_max,0.,altp,mach,disa)
+    tow_1 = numpy.linspace(tow_min,weights.mtow,n_point)
+    fuel_1 = tow_1 - weights.owe - payload_max
+
+    # MTOW segment, payload is traded for fuel
+    #-----------------------------------------------------------------------------------------------------------
+    payload_mfw = weights.mtow - weights.owe - weights.mfw
+    tow_2 = numpy.full(n_point,weights.mtow)
+    fuel_2 = tow_2 - weights.owe - numpy.linspace(payload_max,payload_mfw,n_point)
+
+    # Maximum fuel segment, payload goes down to zero
+    #-----------------------------------------------------------------------------------------------------------
+    fuel_3 = numpy.full(n_point,weights.mfw)
+    tow_3 = weights.owe + numpy.linspace(payload_mfw,0.,n_point) + fuel_3
+
+    tow = numpy.concatenate((tow_1,tow_2,tow_3))
+    total_fuel = numpy.concatenate((fuel_1,fuel_2,fuel_3))
+
+    dist_range,payload,block_fuel,block_time = payload_range_points(aircraft,tow,total_fuel,altp,mach,disa)
+
+    return dist_range,payload,tow,total_fuel,block_fuel,block_time
+
+
+#===========================================================================================================
+def payload_range_family(aircraft_list,conditions,n_point=50):
+    """
+    Payload - Range envelopes of several aircraft for several flight conditions
+    conditions : list of (altp,mach,disa)
+    Returns range, payload, tow, total fuel, block fuel and block time arrays of shape
+    (number of aircraft, number of conditions, 3*n_point)
+    """
+
+    shape = (len(aircraft_list),len(conditions),3*n_point)
+
+    data = [numpy.zeros(shape) for k in range(6)]
+
+    for i,aircraft in enumerate(aircraft_list):
+        for j,(altp,mach,disa) in enumerate(conditions):
+            envelope = payload_range_envelope(aircraft,altp,mach,disa,n_point)
+            for k in range(6):
+                data[k][i,j,:] = envelope[k]
+
+    return tuple(data)
@@ -53,9 +53,11 @@ def one_airframe_price(aircraft):
 
 
 #===========================================================================================================
-def eval_operating_costs(aircraft,block_fuel,block_time):
+def operating_costs(aircraft,block_fuel,block_time,dist_range):
     """
     Computes Cash and Direct Operating Costs per flight (based on AAE 451 Spring 2004)
+    block_fuel, block_time and dist_range can be arrays, aircraft is not modified
+    Returns a dictionary holding the cost items
     """
 
     cabin = aircraft.cabin
@@ -63,7 +65,6 @@ def eval_operating_costs(aircraft,block_fuel,block_time):
     battery = aircraft.battery
     engine = aircraft.turbofan_engine
     weights = aircraft.weights
-    cost_mission = aircraft.cost_mission
 
     eco = aircraft.economics
 
@@ -75,10 +76,12 @@ def eval_operating_costs(aircraft,block_fuel,block_time):
 
     fuel_density = earth.fuel_density(propulsion.fuel_type)
 
+    cost = {}
+
     # Cash Operating Cost
     #-----------------------------------------------------------------------------------------------------------------------------------------------
-    eco.fuel_cost =   (block_fuel*(eco.fuel_price*1e3)/fuel_density) \
-                    + battery.energy_cruise*eco.elec_price
+    cost["fuel_cost"] =   (block_fuel*(eco.fuel_price*1e3)/fuel_density) \
+                        + battery.energy_cruise*eco.elec_price
 
     b_h = block_time/3600
     t_t = b_h + 0.25
@@ -96,23 +99,23 @@ def eval_operating_costs(aircraft,block_fuel,block_time):
 
     w_g = weights.mtow*1e-3
 
-    eco.cockpit_crew_cost = b_h*2*(440-0.532*w_g)
+    cost["cockpit_crew_cost"] = b_h*2*(440-0.532*w_g)
 
-    eco.cabin_crew_cost = b_h*numpy.ceil(cabin.n_pax_ref/50)*labor_cost
+    cost["cabin_crew_cost"] = b_h*numpy.ceil(cabin.n_pax_ref/50)*labor_cost
 
-    eco.landing_fees = 8.66*(weights.mtow*1e-3)
+    cost["landing_fees"] = 8.66*(weights.mtow*1e-3)
 
-    eco.navigation_fees = 57*(cost_mission.range/185200)*numpy.sqrt((weights.mtow/1000)/50)
+    cost["navigation_fees"] = 57*(dist_range/185200)*numpy.sqrt((weights.mtow/1000)/50)
 
-    eco.catering_cost = 3.07 * cabin.n_pax_ref
+    cost["catering_cost"] = 3.07 * cabin.n_pax_ref
 
-    eco.pax_handling_cost = 2 * cabin.n_pax_ref
+    cost["pax_handling_cost"] = 2 * cabin.n_pax_ref
 
-    eco.ramp_handling_cost = 8.70 * cabin.n_pax_ref
+    cost["ramp_handling_cost"] = 8.70 * cabin.n_pax_ref
 
-    std_op_cost = eco.fuel_cost + frame_cost + engine_cost + eco.cockpit_crew_cost + eco.landing_fees + eco.navigation_fees
+    std_op_cost = cost["fuel_cost"] + frame_cost + engine_cost + cost["cockpit_crew_cost"] + cost["landing_fees"] + cost["navigation_fees"]
 
-    cash_op_cost = std_op_cost + eco.cabin_crew_cost + eco.catering_cost + eco.pax_handling_cost + eco.ramp_handling_cost
+    cash_op_cost = std_op_cost + cost["cabin_crew_cost"] + cost["catering_cost"] + cost["pax_handling_cost"] + cost["ramp_handling_cost"]
 
     # DirectOperating Cost
     #-----------------------------------------------------------------------------------------------------------------------------------------------
@@ -126,17 +129,42 @@ def eval_operating_costs(aircraft,block_fuel,block_time):
 
     aircraft_price = frame_price + engine_price * engine.n_engine + gear_price + battery_price
 
-    eco.total_investment = frame_price * 1.06 + engine.n_engine * engine_price * 1.025
+    cost["total_investment"] = frame_price * 1.06 + engine.n_engine * engine_price * 1.025
+
+    cost["interest"] = (cost["total_investment"]/(utilisation*period)) * (irp * 0.04 * (((1 + interest_rate)**irp)/((1 + interest_rate)**irp - 1)) - 1)
+
+    cost["insurance"] = 0.0035 * aircraft_price/utilisation
+
+    cost["depreciation"] = 0.99 * (cost["total_investment"] / (utilisation * period))     # Depreciation
+
+    direct_op_cost = cash_op_cost + cost["interest"] + cost["depreciation"] + cost["insurance"]
+
+    cost["direct_op_cost"] = direct_op_cost
+    cost["cash_op_cost"] = cash_op_cost
+    cost["battery_price"] = battery_price
+    cost["gear_price"] = gear_price
+    cost["engine_price"] = engine_price
+    cost["aircraft_price"] = aircraft_price
+
+    return cost
 
-    eco.interest = (eco.total_investment/(utilisation*period)) * (irp * 0.04 * (((1 + interest_rate)**irp)/((1 + interest_rate)**irp - 1)) - 1)
 
-    eco.insurance = 0.0035 * aircraft_price/utilisation
+#===========================================================================================================
+def eval_operating_costs(aircraft,block_fuel,block_time):
+    """
+    Computes Cash and Direct Operating Costs per flight (based on AAE 451 Spring 2004)
+    """
+
+    eco = aircraft.economics
 
-    eco.depreciation = 0.99 * (eco.total_investment / (utilisation * period))     # Depreciation
+    cost = operating_costs(aircraft,block_fuel,block_time,aircraft.cost_mission.range)
 
-    direct_op_cost = cash_op_cost + eco.interest + eco.depreciation + eco.insurance
+    for name in ("fuel_cost","cockpit_crew_cost","cabin_crew_cost","landing_fees","navigation_fees",
+                 "catering_cost","pax_handling_cost","ramp_handling_cost",
+                 "total_investment","interest","insurance","depreciation"):
+        setattr(eco,name,cost[name])
 
-    return direct_op_cost,cash_op_cost,battery_price,gear_price,engine_price,aircraft_price
+    return cost["direct_op_cost"],cost["cash_op_cost"],cost["battery_price"],cost["gear_price"],cost["engine_price"],cost["aircraft_price"]
 
 
 
@@ -7,8 +7,10 @@ Created on Thu Jan 24 23:22:21 2019
 """
 
 
+import re
 import numpy
 import copy
+import operator
 from scipy.optimize import fsolve,minimize
 from marilib.tools.math import maximize_1d, trinome
 from marilib.tools import units as unit
@@ -18,6 +20,7 @@ from marilib.earth import environment_grad as g_earth
 from marilib.aircraft_model.airplane import aerodynamics as airplane_aero
 from marilib.airplane.propulsion import propulsion_models as propu
 from marilib.aircraft_model.operations import flight_mechanics as flight
+from marilib.aircraft_model.operations import mission as perfo
 
 state_dict = {"time":0, "mass":1, "xg":2, "zg":3, "vgnd":4, "path":5}
 
@@ -31,6 +34,204 @@ xout_dict = {"time":0, "mass":1, "xg":2, "zg":3, "vgnd":4, "path":5,
              "wx":34, "wx_d":35, "wz":36, "wz_d":37,
              "cz":38, "cx":39, "fn":40}
 
+# Tolerance on the distance flown at the end of a qs_mission and maximum number of descents flown to reach it
+tod_tol = 10.
+max_tod_trial = 6
+
+# Number of successive failed warm starts after which a kind of segment is solved from cold starting points
+max_warm_failure = 3
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+class FlightHistory(object):
+    """
+    Growable table of flight points, one row per point with the columns of xout_dict
+    Rows are stored in a preallocated buffer whose capacity is doubled when full,
+    indexing works as for the (number of points, number of columns) array of stored points
+    """
+    def __init__(self, capacity = 256,
+                       n_column = len(xout_dict)):
+        """
+        Constructor :
+            :param capacity: Uu int - OoM 10^2 - Initial number of rows of the buffer
+            :param n_column: Uu int - OoM 10^1 - Number of columns
+        """
+        self.buffer = numpy.empty((capacity,n_column))
+        self.n_point = 0
+
+    def append(self,xout):
+        if (self.n_point==self.buffer.shape[0]):
+            buffer = numpy.empty((2*self.buffer.shape[0],self.buffer.shape[1]))
+            buffer[0:self.n_point,:] = self.buffer[0:self.n_point,:]
+            self.buffer = buffer
+        self.buffer[self.n_point,:] = xout
+        self.n_point += 1
+
+    def truncate(self,n_point):
+        """
+        Keep the n_point first rows
+        """
+        self.n_point = min(int(n_point),self.n_point)
+
+    @property
+    def data(self):
+        """
+        View of the stored points, no copy
+        """
+        return self.buffer[0:self.n_point,:]
+
+    @property
+    def shape(self):
+        return (self.n_point,self.buffer.shape[1])
+
+    def column(self,name):
+        """
+        View of one column given by its xout_dict name
+        """
+        return self.buffer[0:self.n_point,xout_dict[name]]
+
+    def __len__(self):
+        return self.n_point
+
+    def __getitem__(self,key):
+        if isinstance(key,str):
+            return self.column(key)
+        return self.data[key]
+
+    def __setitem__(self,key,value):
+        self.data[key] = value
+
+    def __array__(self,dtype=None,copy=None):
+        if (dtype is None):
+            return self.data
+        return self.data.astype(dtype)
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+class Integrator(object):
+    """
+    Time integration settings and statistics of flight segments
+    method "euler" is the fixed step explicit Euler scheme with the step given by each segment,
+    method "rk23" is the embedded Runge-Kutta 3(2) scheme of Bogacki and Shampine with step size control on
+    mass and xg, the step given by each segment is only the first trial step and segment ends are located
+    by event detection on the stop condition
+    With warm_start, each flight point solve starts from the previous converged solution of the same kind of
+    segment (same commands and degrees of freedom), optionally extrapolated in time by a linear predictor
+    """
+    def __init__(self, method = "euler",
+                       rtol = 1.e-6,
+                       mass_tol = 1.e-2,
+                       xg_tol = 1.,
+                       dt_max = 900.,
+                       event_tol = 1.e-6,
+                       warm_start = True,
+                       predictor = False):
+        """
+        Constructor :
+            :param method: Uu string - OoM 10^0 - "euler" or "rk23"
+            :param rtol: Uu no_dim - OoM 10^-6 - Relative local error tolerance on mass and xg
+            :param mass_tol: Uu kg - OoM 10^-2 - Absolute local error tolerance on mass
+            :param xg_tol: Uu m - OoM 10^0 - Absolute local error tolerance on xg
+            :param dt_max: Uu s - OoM 10^2 - Maximum time step
+            :param event_tol: Uu no_dim - OoM 10^-6 - Relative accuracy of the stop condition at segment end
+            :param warm_start: Uu bool - OoM 10^0 - Start flight point solves from the previous converged solution
+            :param predictor: Uu bool - OoM 10^0 - Extrapolate the two previous solutions linearly in time, needs warm_start
+            :param n_segment: Uu int - OoM 10^1 - Number of integrated segments
+            :param n_step: Uu int - OoM 10^2 - Number of accepted steps
+            :param n_reject: Uu int - OoM 10^1 - Number of rejected steps
+            :param n_solve: Uu int - OoM 10^2 - Number of flight point solves
+            :param solve_nfev: Uu int - OoM 10^1 - Number of residual evaluations of each flight point solve
+            :param n_cold_retry: Uu int - OoM 10^0 - Number of warm started solves that failed and were restarted cold
+        """
+        if method not in ("euler","rk23"):
+            raise Exception("Integrator, unknown method : "+str(method))
+        self.method = method
+        self.rtol = rtol
+        self.mass_tol = mass_tol
+        self.xg_tol = xg_tol
+        self.dt_max = dt_max
+        self.event_tol = event_tol
+        self.warm_start = warm_start
+        self.predictor = predictor
+        self.reset()
+
+    def reset(self):
+        self.n_segment = 0
+        self.n_step = 0
+        self.n_reject = 0
+        self.n_solve = 0
+        self.solve_nfev = []
+        self.n_cold_retry = 0
+        self.last_key = None
+        self.last_solutions = []
+        self.warm_failures = {}
+
+    def guess(self,spec,time,var):
+        """
+        Starting point of a flight point solve, var is the cold starting point
+        """
+        key = (tuple(spec.cmd_idx),tuple(spec.dof_idx))
+        if (not self.warm_start or key!=self.last_key or len(self.last_solutions)==0
+                or max_warm_failure<=self.warm_failures.get(key,0)):
+            return var
+        t1,x1 = self.last_solutions[-1]
+        if (self.predictor and len(self.last_solutions)==2):
+            t0,x0 = self.last_solutions[0]
+            if (t0<t1 and t1<time):
+                return x1 + (x1-x0)*(time-t1)/(t1-t0)
+        return x1
+
+    def record(self,spec,time,output_dict,memorize=True,warm=False):
+        """
+        Store the result of a fsolve call made with full_output=True, warm tells if it was warm started
+        """
+        self.solve_nfev.append(output_dict[1]["nfev"])
+        if (not memorize or output_dict[2]!=1):
+            return
+        key = (tuple(spec.cmd_idx),tuple(spec.dof_idx))
+        if warm:
+            self.warm_failures[key] = 0
+        if (key!=self.last_key):
+            self.last_key = key
+            self.last_solutions = []
+        if (0<len(self.last_solutions) and time<=self.last_solutions[-1][0]):
+            self.last_solutions = []
+        self.last_solutions = self.last_solutions[-1:] + [(time,output_dict[0].copy())]
+
+    def warm_start_failed(self,spec):
+        """
+        Count a failed warm started solve, warm start of this kind of segment is abandoned after max_warm_failure
+        successive failures
+        """
+        self.n_cold_retry += 1
+        key = (tuple(spec.cmd_idx),tuple(spec.dof_idx))
+        self.warm_failures[key] = self.warm_failures.get(key,0) + 1
+
+    def stats(self):
+        nfev = numpy.array(self.solve_nfev, dtype=int)
+        return {"method":self.method, "n_segment":self.n_segment, "n_step":self.n_step,
+                "n_reject":self.n_reject, "n_solve":self.n_solve,
+                "nfev":int(numpy.sum(nfev)), "mean_nfev":(float(numpy.mean(nfev)) if len(nfev)>0 else 0.),
+                "max_nfev":(int(numpy.max(nfev)) if len(nfev)>0 else 0), "n_cold_retry":self.n_cold_retry}
+
+
+#===========================================================================================================
+def as_flight_history(flight):
+    """
+    FlightHistory holding the points of a 2D array, or the FlightHistory itself
+    """
+
+    if isinstance(flight,FlightHistory):
+        return flight
+
+    flight = numpy.atleast_2d(flight)
+
+    history = FlightHistory(capacity=max(256,2*flight.shape[0]), n_column=flight.shape[1])
+    history.buffer[0:flight.shape[0],:] = flight
+    history.n_point = flight.shape[0]
+
+    return history
+
 
 #===========================================================================================================
 def cabin_virtual_altp():
@@ -162,59 +363,171 @@ def fct_thrust(aircraft,state,rating,nei):
     return fn
 
 
+# Flight point unknowns that can be given by data or used as command : position in xin
+param_dict = {"cz":0, "fn":1}
+
+# Functions that can be called in specification expressions
+spec_functions = {"fct_thrust":fct_thrust}
+
+# Names that can be used in specification expressions, in calling order of compiled expressions
+spec_context = ("aircraft","state","rating","nei","input")
+
+# Comparison operators of stop conditions
+spec_operators = {"<":operator.lt, ">":operator.gt, "<=":operator.le, ">=":operator.ge}
+
+
 #===========================================================================================================
-def flight_point(aircraft,rating,nei,state,var,input,dat,cmd,dof,cst):
+def compile_expression(expr):
+    """
+    Turn a specification string into a function of (aircraft,state,rating,nei,input)
+    Recognized forms are numbers, "input[i]" and calls to spec_functions with context names as arguments,
+    any other string is compiled once and evaluated with the context names
+    Also returns True if the value depends only on input
+    """
 
-    #===========================================================================================================
-    def fct_flight_point(var,state,input,dat,cmd,dof,cst,nei,rating,aircraft):
+    expr = str(expr).strip()
+
+    for number in (int,float):
+        try:
+            value = number(expr)
+            return (lambda aircraft,state,rating,nei,input: value), True
+        except ValueError:
+            pass
+
+    match = re.match(r"^input\[(\d+)\]$", expr)
+    if match:
+        i = int(match.group(1))
+        return (lambda aircraft,state,rating,nei,input: input[i]), True
+
+    match = re.match(r"^(\w+)\(([\w,\s]*)\)$", expr)
+    if match and match.group(1) in spec_functions:
+        fct = spec_functions[match.group(1)]
+        names = [name.strip() for name in match.group(2).split(",") if name.strip()!=""]
+        if all([name in spec_context for name in names]):
+            pos = [spec_context.index(name) for name in names]
+            def call(aircraft,state,rating,nei,input):
+                context = (aircraft,state,rating,nei,input)
+                return fct(*[context[k] for k in pos])
+            return call, False
+
+    code = compile(expr,"<flight specification>","eval")
+    namespace = globals()   # Module names are looked up, context names are bound at each call
+    def evaluate(aircraft,state,rating,nei,input):
+        return eval(code,namespace,{"aircraft":aircraft,"state":state,"rating":rating,"nei":nei,"input":input})
+
+    return evaluate, False
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+class FlightPointSpec(object):
+    """
+    Flight point specification compiled into positions and functions
+    """
+    def __init__(self, dat = (),
+                       cmd = (),
+                       dof = (),
+                       cst = ()):
+        """
+        Constructor :
+            :param dat: Uu list - OoM 10^0 - Couples (xin name, expression) of unknowns given by data
+            :param cmd: Uu list - OoM 10^0 - Names of xin components solved as commands
+            :param dof: Uu list - OoM 10^0 - Names of state components solved as degrees of freedom
+            :param cst: Uu list - OoM 10^0 - Couples (xout name, expression) of constraints
+        """
+        self.dat_idx = [param_dict[d[0]] for d in dat]
+        self.dat_fct = [compile_expression(d[1])[0] for d in dat]
+        self.cmd_idx = numpy.array([param_dict[c] for c in cmd], dtype=int)
+        self.dof_idx = numpy.array([state_dict[d] for d in dof], dtype=int)
+        self.cst_idx = numpy.array([xout_dict[c[0]] for c in cst], dtype=int)
+        self.cst_fct = [compile_expression(c[1]) for c in cst]
+        self.n_cmd = len(self.cmd_idx)
+
+    def set_unknowns(self,var,xin,state,rating,nei,input,aircraft):
+        """
+        Write data, commands and degrees of freedom into xin and state, in this order
+        """
+        for i,fct in zip(self.dat_idx,self.dat_fct):
+            xin[i] = fct(aircraft,state,rating,nei,input)
+        xin[self.cmd_idx] = var[0:self.n_cmd]
+        state[self.dof_idx] = var[self.n_cmd:]
+
+    def constraint_values(self,state,rating,nei,input,aircraft):
+        """
+        Right hand sides of the constraints, None for those that must be evaluated at each residual call
+        """
+        return [fct(aircraft,state,rating,nei,input) if static else None for fct,static in self.cst_fct]
 
-        for i in range(n_dat):
-            param[dat[i][0]] = eval(dat[i][1])
 
-        for i in range(n_cmd):
-             param[cmd[i]] = var[i]
+#===========================================================================================================
+def compile_stop(stop,input,aircraft=None,state=None,rating=None,nei=None):
+    """
+    Stop condition ["name","op","expression"] : returns xout position, comparison function and stop value
+    """
 
-        xin = numpy.array([param["cz"],param["fn"]])
+    fct,static = compile_expression(stop[2])
 
-        for i in range(n_dof):
-            state[state_dict[dof[i]]] = var[n_cmd+i]
+    return xout_dict[str(stop[0])], spec_operators[str(stop[1]).strip()], fct(aircraft,state,rating,nei,input)
 
-        xout,state_d = state_dot(xin,state,rating,nei,aircraft)
 
-        res = [None]*n_cst
-        for i in range(n_cst):
-            res[i] = xout[xout_dict[cst[i][0]]] - eval(cst[i][1])
+#===========================================================================================================
+def flight_point(aircraft,rating,nei,state,var,input,dat,cmd,dof,cst,integrator=None):
+    """
+    Solve one flight point, dat, cmd, dof, cst are the string specifications, see FlightPointSpec
+    If given, integrator only counts residual evaluations, the solve is neither warm started nor memorized
+    """
 
-        return res
-    #-----------------------------------------------------------------------------------------------------------
+    spec = FlightPointSpec(dat,cmd,dof,cst)
 
-    # Initialize level flight
+    return solve_flight_point(aircraft,rating,nei,state,var,input,spec,integrator,False)
+
+
+#===========================================================================================================
+def solve_flight_point(aircraft,rating,nei,state,var,input,spec,integrator=None,warm_start=True):
+    """
+    Solve one flight point described by a compiled specification, var is the cold starting point
+    If an Integrator is given, its statistics are updated and, if warm_start, its guess is used as starting point,
+    a failed warm started solve is restarted from var
+    """
+
+    cst_val = spec.constraint_values(state,rating,nei,input,aircraft)
+    cst_dyn = [(i,spec.cst_fct[i][0]) for i in range(len(cst_val)) if cst_val[i] is None]
+
+    #===========================================================================================================
+    def fct_flight_point(var,state,input,nei,rating,aircraft):
+
+        spec.set_unknowns(var,xin,state,rating,nei,input,aircraft)
+
+        xout,state_d = state_dot(xin,state,rating,nei,aircraft)
+
+        for i,fct in cst_dyn:
+            cst_val[i] = fct(aircraft,state,rating,nei,input)
+
+        return [x-v for x,v in zip(xout[spec.cst_idx],cst_val)]
     #-----------------------------------------------------------------------------------------------------------
-    n_dat = numpy.shape(dat)[0]
-    n_cmd = numpy.shape(cmd)[0]
-    n_dof = numpy.shape(dof)[0]
-    n_cst = numpy.shape(cst)[0]
 
-    param = {"cz":0.,"fn":0.}
+    xin = numpy.zeros(2)
 
-    fct_args = (state,input,dat,cmd,dof,cst,nei,rating,aircraft)
+    fct_args = (state,input,nei,rating,aircraft)
 
-    out_dict = fsolve(fct_flight_point, x0=var, args=fct_args, full_output=True)
+    if (integrator is None):
+        out_dict = fsolve(fct_flight_point, x0=var, args=fct_args, full_output=True)
+    else:
+        time = state[state_dict["time"]]
+        x0 = integrator.guess(spec,time,var) if warm_start else var
+        dof_ini = state[spec.dof_idx]
+        out_dict = fsolve(fct_flight_point, x0=x0, args=fct_args, full_output=True)
+        integrator.record(spec,time,out_dict,warm_start,x0 is not var)
+        if (out_dict[2]!=1 and x0 is not var):
+            integrator.warm_start_failed(spec)
+            state[spec.dof_idx] = dof_ini
+            out_dict = fsolve(fct_flight_point, x0=var, args=fct_args, full_output=True)
+            integrator.record(spec,time,out_dict,warm_start)
 
     rei = out_dict[2]
     if(rei!=1):
         raise Exception("Impossible to converge flight point",unit.NM_m(state[state_dict["xg"]]))
 
-    for i in range(n_dat):
-        param[dat[i][0]] = eval(dat[i][1])
-
-    for i in range(n_cmd):
-        param[cmd[i]] = out_dict[0][i]
-
-    xin = numpy.array([param["cz"],param["fn"]])
-
-    for i in range(n_dof):
-        state[state_dict[dof[i]]] = out_dict[0][n_cmd+i]
+    spec.set_unknowns(out_dict[0],xin,state,rating,nei,input,aircraft)
 
     xout,state_d = state_dot(xin,state,rating,nei,aircraft)
 
@@ -222,33 +535,51 @@ def flight_point(aircraft,rating,nei,state,var,input,dat,cmd,dof,cst):
 
 
 #===========================================================================================================
-def flight_segment(aircraft,rating,nei,state,stop,input,dat,cmd,dof,cst,dt,flight):
+def flight_segment(aircraft,rating,nei,state,stop,input,dat,cmd,dof,cst,dt,flight,integrator=None):
+    """
+    Integrate a flight segment until the stop condition is false
+    integrator is an optional Integrator, fixed step Euler with step dt is used if None
+    """
 
     # Initialize level flight
     #-----------------------------------------------------------------------------------------------------------
+    flight = as_flight_history(flight)
+
     xout = flight[-1,:]
 
     var = init_var(aircraft,state,cmd,dof)
 
-    stop_idx = xout_dict[stop[0]]
-    stop_val = eval(stop[2])
-    op = stop[1]
+    spec = FlightPointSpec(dat,cmd,dof,cst)
+
+    stop_idx,op,stop_val = compile_stop(stop,input,aircraft,state,rating,nei)
+
+    if not op(xout[stop_idx],stop_val):     # Stop condition is already reached
+        return flight,state
+
+    if (integrator is not None):
+        integrator.n_segment += 1
+        if (integrator.method=="rk23"):
+            return adaptive_segment(aircraft,rating,nei,state,var,input,spec,stop_idx,op,stop_val,dt,flight,integrator)
 
     # Play level flight
     #-----------------------------------------------------------------------------------------------------------
-    while (eval("xout[stop_idx]"+op+"stop_val")):
+    while (op(xout[stop_idx],stop_val)):
 
-        xout,state,state_d = flight_point(aircraft,rating,nei,state,var,input,dat,cmd,dof,cst)
+        xout,state,state_d = solve_flight_point(aircraft,rating,nei,state,var,input,spec,integrator)
 
-        flight = numpy.vstack([flight,xout])
+        flight.append(xout)
 
         state = state + state_d*dt
 
+        if (integrator is not None):
+            integrator.n_step += 1
+            integrator.n_solve += 1
+
     # Adjust last point using interpolation
     #-----------------------------------------------------------------------------------------------------------
     xout = flight[-2,:] + (flight[-1,:]-flight[-2,:]) \
-                         *(stop_val - flight[-2,xout_dict[stop[0]]]) \
-                         /(flight[-1,xout_dict[stop[0]]] - flight[-2,xout_dict[stop[0]]])
+                         *(stop_val - flight[-2,stop_idx]) \
+                         /(flight[-1,stop_idx] - flight[-2,stop_idx])
 
     flight[-1,:] = xout
     state = xout[0:6]
@@ -257,7 +588,117 @@ def flight_segment(aircraft,rating,nei,state,stop,input,dat,cmd,dof,cst,dt,fligh
 
 
 #===========================================================================================================
-def iso_cas_climb(aircraft,vcas1,altp1,vcas2,altp2,mach,vz_mcl_min,flight):
+def adaptive_segment(aircraft,rating,nei,state,var,input,spec,stop_idx,op,stop_val,dt,flight,integrator):
+    """
+    Integrate a flight segment with the embedded Runge-Kutta 3(2) scheme of Bogacki and Shampine
+    Components of the state that are degrees of freedom of the flight point are not integrated, they are solved
+    The segment end is located on the cubic Hermite interpolant of the last step by regula falsi iterations
+    """
+
+    mask = numpy.ones(len(state), dtype=bool)
+    mask[spec.dof_idx] = False
+
+    i_mass = state_dict["mass"]
+    i_xg = state_dict["xg"]
+
+    def solve(y):
+        integrator.n_solve += 1
+        xout,y,y_d = solve_flight_point(aircraft,rating,nei,y.copy(),var,input,spec,integrator)
+        return xout,y,y_d
+
+    def move(y,h,k):
+        z = y.copy()
+        z[mask] = y[mask] + h*k[mask]
+        return z
+
+    xout0,y0,k1 = solve(state)
+
+    if not op(xout0[stop_idx],stop_val):
+        return flight,y0
+
+    h = min(dt,integrator.dt_max)
+
+    while True:
+
+        flight.append(xout0)
+
+        # Step with error control
+        #-----------------------------------------------------------------------------------------------------------
+        while True:
+            try:
+                xout2,y2,k2 = solve(move(y0,0.5*h,k1))
+                xout3,y3,k3 = solve(move(y0,0.75*h,k2))
+                y1 = move(y0,h,(2./9.)*k1 + (1./3.)*k2 + (4./9.)*k3)
+                xout1,y1,k4 = solve(y1)
+            except Exception:
+                if (h<1.e-3*dt):
+                    raise
+                integrator.n_reject += 1
+                h = 0.25*h
+                continue
+
+            err = h*((-5./72.)*k1 + (1./12.)*k2 + (1./9.)*k3 + (-1./8.)*k4)
+            tol = numpy.array([integrator.mass_tol + integrator.rtol*abs(y1[i_mass]),
+                               integrator.xg_tol + integrator.rtol*abs(y1[i_xg])])
+            err_norm = max(abs(err[i_mass])/tol[0], abs(err[i_xg])/tol[1])
+
+            if (err_norm<=1.):
+                break
+
+            integrator.n_reject += 1
+            h = h*max(0.2, 0.9*err_norm**(-1./3.))
+
+        integrator.n_step += 1
+
+        if not op(xout1[stop_idx],stop_val):
+            break
+
+        xout0,y0,k1 = xout1,y1,k4
+        h = min(h*min(5., 0.9*max(err_norm,1.e-10)**(-1./3.)), integrator.dt_max)
+
+    # Locate the end of the segment
+    #-----------------------------------------------------------------------------------------------------------
+    def hermite(theta):
+        y = y1.copy()
+        h00 = 2*theta**3 - 3*theta**2 + 1
+        h10 = theta**3 - 2*theta**2 + theta
+        h01 = -2*theta**3 + 3*theta**2
+        h11 = theta**3 - theta**2
+        y[mask] = h00*y0[mask] + h10*h*k1[mask] + h01*y1[mask] + h11*h*k4[mask]
+        return y
+
+    g_a,g_b = xout0[stop_idx]-stop_val, xout1[stop_idx]-stop_val
+    theta_a,theta_b = 0.,1.
+    xout_e = xout1
+    side = 0
+
+    # Illinois variant of regula falsi
+    for i in range(10):
+        if (abs(xout_e[stop_idx]-stop_val)<=integrator.event_tol*max(1.,abs(stop_val))):
+            break
+        theta = (theta_a*g_b - theta_b*g_a)/(g_b - g_a)
+        xout_e,y_e,k_e = solve(hermite(theta))
+        g = xout_e[stop_idx] - stop_val
+        if (0.<g*g_b):
+            theta_b,g_b = theta,g
+            if (side==-1):
+                g_a *= 0.5
+            side = -1
+        elif (0.<g*g_a):
+            theta_a,g_a = theta,g
+            if (side==1):
+                g_b *= 0.5
+            side = 1
+        else:
+            break
+
+    flight.append(xout_e)
+
+    return flight,xout_e[0:6].copy()
+
+
+#===========================================================================================================
+def iso_cas_climb(aircraft,vcas1,altp1,vcas2,altp2,mach,vz_mcl_min,flight,integrator=None):
     """
     Constant CAS climb :
     vcas1 from altp0 to altp1
@@ -266,6 +707,8 @@ def iso_cas_climb(aircraft,vcas1,altp1,vcas2,altp2,mach,vz_mcl_min,flight):
 
     # Initialize climb flight
     #-----------------------------------------------------------------------------------------------------------
+    flight = as_flight_history(flight)
+
     xout = flight[-1,:]
     state = xout[0:6]
     altp0 = xout[xout_dict["altp"]]
@@ -301,7 +744,7 @@ def iso_cas_climb(aircraft,vcas1,altp1,vcas2,altp2,mach,vz_mcl_min,flight):
     stop = numpy.array(["altp","<","input[1]"])
     dt = 30.
 
-    flight,state = flight_segment(aircraft,MCL,nei,state,stop,input,dat,cmd,dof,cst,dt,flight)
+    flight,state = flight_segment(aircraft,MCL,nei,state,stop,input,dat,cmd,dof,cst,dt,flight,integrator)
 
     # Acceleration at constant altitude
     #-----------------------------------------------------------------------------------------------------------
@@ -313,7 +756,7 @@ def iso_cas_climb(aircraft,vcas1,altp1,vcas2,altp2,mach,vz_mcl_min,flight):
     stop = numpy.array(["vcas","<","input[1]"])
     dt = 5.
 
-    flight,state = flight_segment(aircraft,MCL,nei,state,stop,input,dat,cmd,dof,cst,dt,flight)
+    flight,state = flight_segment(aircraft,MCL,nei,state,stop,input,dat,cmd,dof,cst,dt,flight,integrator)
 
     # Second climb segment
     #-----------------------------------------------------------------------------------------------------------
@@ -325,7 +768,7 @@ def iso_cas_climb(aircraft,vcas1,altp1,vcas2,altp2,mach,vz_mcl_min,flight):
     stop = numpy.array(["altp","<","input[1]"])
     dt = 30.
 
-    flight,state = flight_segment(aircraft,MCL,nei,state,stop,input,dat,cmd,dof,cst,dt,flight)
+    flight,state = flight_segment(aircraft,MCL,nei,state,stop,input,dat,cmd,dof,cst,dt,flight,integrator)
 
     if(flight[-1,xout_dict["vzair"]]<vz_mcl_min):
         raise Exception("iso_cas_climb, final altitude cannot be reached with minimum required vertical speed")
@@ -334,25 +777,39 @@ def iso_cas_climb(aircraft,vcas1,altp1,vcas2,altp2,mach,vz_mcl_min,flight):
 
 
 #===========================================================================================================
-def level_flight(aircraft,mach,vz_mcl_min,vz_mcr_min,heading,stop,flight):
+def level_flight(aircraft,mach,vz_mcl_min,vz_mcr_min,heading,stop,flight,integrator=None,ceiling_cache=None):
+    """
+    Step cruise at constant Mach on the flight levels of the heading
+    Specific air ranges of altp and of all upper levels are computed in one array evaluation at each decision,
+    the aircraft climbs to the most efficient upper level that is better than altp and that ceilings allow to reach,
+    ceilings are taken from ceiling_cache, a new CeilingCache is used if None
+    Decisions are made every 120 s of cruise, with a rk23 integrator cruise segments run up to the next decision
+    predicted by next_decision_time so that the integrator can take long steps
+    """
 
-    westbound = numpy.concatenate((numpy.arange(2000.,41000.,2000.),numpy.arange(43000.,85000.,4000.)))
-    eastbound = numpy.concatenate((numpy.arange(1000.,42000.,2000.),numpy.arange(45000.,87000.,4000.)))
+    westbound = unit.m_ft(numpy.concatenate((numpy.arange(2000.,41000.,2000.),numpy.arange(43000.,85000.,4000.))))
+    eastbound = unit.m_ft(numpy.concatenate((numpy.arange(1000.,42000.,2000.),numpy.arange(45000.,87000.,4000.))))
     ladder = {"West":westbound, "East":eastbound}
 
     # Initialize level flight
     #-----------------------------------------------------------------------------------------------------------
+    flight = as_flight_history(flight)
+
     xout = flight[-1,:]
     state = xout[0:6]
     altp = xout[xout_dict["altp"]]
-    altp_up = ladder[heading][numpy.where(ladder[heading]>(altp+1))[0][0]]      # Lower altitude imediatly higher than altp1
+    disa = xout[xout_dict["disa"]]
+    levels = ladder[heading][ladder[heading]>(altp+1)]      # Flight levels higher than altp
 
     (MTO,MCN,MCL,MCR,FID) = aircraft.propulsion.rating_code
     nei = 0.
 
+    if (ceiling_cache is None):
+        ceiling_cache = CeilingCache(aircraft,nei,mach,integrator=integrator)
+
     # Test cruise ceiling
     #-----------------------------------------------------------------------------------------------------------
-    vz_mcr,vz_mcl = test_ceilings(aircraft,nei,mach,altp,state)
+    vz_mcr,vz_mcl = ceiling_cache.ceilings(altp,state)
 
     if (vz_mcl < vz_mcl_min):
         raise Exception("Cannot start level flight because of MCL ceiling")
@@ -360,99 +817,109 @@ def level_flight(aircraft,mach,vz_mcl_min,vz_mcr_min,heading,stop,flight):
     if (vz_mcr < vz_mcr_min):
         raise Exception("Cannot start level flight because of MCR ceiling")
 
-    active_ceiling = 0
-
     # Initialize specific ranges
     #-----------------------------------------------------------------------------------------------------------
-    sar,sar_up = test_air_range(aircraft,MCR,nei,mach,altp,altp_up,state)
+    sar_levels = level_air_range(aircraft,MCR,nei,mach,numpy.concatenate(([altp],levels)),disa,state[state_dict["mass"]])
+
+    blocked = {}    # Levels better than altp but not reachable at last decision : (active_ceiling, active_vz)
 
     dtime = 0.  # Allows to start by a climb by merging transition point to last iso_cas climb
 
     # Fly step cruise
     #-----------------------------------------------------------------------------------------------------------
-    stop_idx = xout_dict[stop[0]]
-    stop_val = eval(stop[2])
-    op = stop[1]
+    stop_idx,op,stop_val = compile_stop(stop,None)
+
+    while (op(flight[-1,stop_idx],stop_val)):
+
+        sar_levels0 = sar_levels
+        blocked0 = blocked
 
-    while (eval("flight[-1,stop_idx]"+op+"stop_val")):
+        sar_levels = level_air_range(aircraft,MCR,nei,mach,numpy.concatenate(([altp],levels)),disa,state[state_dict["mass"]])
+        sar = sar_levels[0]
 
-        sar0 = sar
-        sar_up0 = sar_up
+        # Best upper level that ceilings allow to reach
+        #-----------------------------------------------------------------------------------------------------------
+        i_up = None
+        blocked = {}
 
-        sar,sar_up = test_air_range(aircraft,MCR,nei,mach,altp,altp_up,state)
+        for i in numpy.argsort(-sar_levels[1:], kind="stable"):
 
-        if (sar < sar_up):      # Efficiency is better on upper level
+            if (sar_levels[1+i] <= sar):     # Efficiency is not better on this level nor on the following ones
+                break
 
-            vz_mcr,vz_mcl = test_ceilings(aircraft,nei,mach,altp_up,state)
+            vz_mcr,vz_mcl = ceiling_cache.ceilings(levels[i],state)
 
             if (vz_mcr_min<vz_mcr and vz_mcl_min<vz_mcl):     # Ceilings allow to climb
+                i_up = i
+                break
 
-                if (0<active_ceiling):
+            # Detect the most constraining condition
+            #-----------------------------------------------------------------------------------------------------------
+            if ((vz_mcl_min-vz_mcl)<(vz_mcr_min-vz_mcr)):
+                blocked[i] = (1,vz_mcr)
+            else:
+                blocked[i] = (2,vz_mcl)
+
+        if (i_up is not None):
+
+            if (0.<dtime):
+                if (i_up in blocked0):
                     # Compute transition point according to climb speed
                     #-----------------------------------------------------------------------------------------------------------
+                    active_ceiling,active_vz = blocked0[i_up]
                     if (active_ceiling==1):
                         time =  flight[-1,xout_dict["time"]] - dtime/(1+numpy.abs((vz_mcr_min-active_vz)/(vz_mcr-vz_mcr_min)))
                     else:
                         time =  flight[-1,xout_dict["time"]] - dtime/(1+numpy.abs((vz_mcl_min-active_vz)/(vz_mcl-vz_mcl_min)))
                 else:
-                    # Compute transition point according to SAR
+                    # Compute transition point according to SAR of the target level
                     #-----------------------------------------------------------------------------------------------------------
-                    time =  flight[-1,xout_dict["time"]] - dtime/(1+numpy.abs((sar0-sar_up0)/(sar_up-sar)))
+                    time =  flight[-1,xout_dict["time"]] \
+                          - dtime/(1+numpy.abs((sar_levels0[0]-sar_levels0[1+i_up])/(sar_levels[1+i_up]-sar)))
 
-                xout = flight[-2,:] + (flight[-1,:]-flight[-2,:]) \
-                                     *(time - flight[-2,xout_dict["time"]]) \
-                                     /(flight[-1,xout_dict["time"]] - flight[-2,xout_dict["time"]])
+                n = numpy.where(flight[:,xout_dict["time"]]<time)[0][-1]
 
-                flight[-1,:] = xout
-                state = xout[0:6]
+                xout = flight[n,:] + (flight[n+1,:]-flight[n,:]) \
+                                    *(time - flight[n,xout_dict["time"]]) \
+                                    /(flight[n+1,xout_dict["time"]] - flight[n,xout_dict["time"]])
 
-                # Climb to upper altitude
-                #-----------------------------------------------------------------------------------------------------------
-                dt = 30.
-                input = numpy.array([mach,altp_up])
-                dat = numpy.array([["fn","fct_thrust(aircraft,state,rating,nei)"]])
-                cmd = numpy.array(["cz"])
-                dof = numpy.array(["vgnd","path"])
-                cst = numpy.array([["mach","input[0]"],["mach_d","0"],["path_d","0"]])
-                stop = numpy.array(["altp","<","input[1]"])
-
-                flight,state = flight_segment(aircraft,MCL,nei,state,stop,input,dat,cmd,dof,cst,dt,flight)
-
-                altp = altp_up
-                altp_up = ladder[heading][numpy.where(ladder[heading]>(altp_up+1))[0][0]]
-
-                dtime = 0.  # Allows to continue climbing if best recheable altitude is not found for cruise start
+                flight.truncate(n+2)
+                flight[n+1,:] = xout
+                state = xout[0:6]
 
-            else:
-                # Detect the most constraining condition
-                #-----------------------------------------------------------------------------------------------------------
-                if ((vz_mcl_min-vz_mcl)<(vz_mcr_min-vz_mcr)):
-                    active_ceiling = 1
-                    active_vz = vz_mcr
-                else:
-                    active_ceiling = 2
-                    active_vz = vz_mcl
+            # Climb to target level
+            #-----------------------------------------------------------------------------------------------------------
+            dt = 30.
+            input = numpy.array([mach,levels[i_up]])
+            dat = numpy.array([["fn","fct_thrust(aircraft,state,rating,nei)"]])
+            cmd = numpy.array(["cz"])
+            dof = numpy.array(["vgnd","path"])
+            cst = numpy.array([["mach","input[0]"],["mach_d","0"],["path_d","0"]])
+            stop = numpy.array(["altp","<","input[1]"])
 
-                # Go to next point
-                #-----------------------------------------------------------------------------------------------------------
-                dt = 120.
-                time_stop = state[state_dict["time"]] + dt
-                input = numpy.array([altp,mach,time_stop])
-                dat = numpy.array([])
-                cmd = numpy.array(["cz","fn"])
-                dof = numpy.array(["zg","vgnd","path"])
-                cst = numpy.array([["altp","input[0]"],["altp_d","0"],["mach","input[1]"],["mach_d","0"],["path_d","0"]])
-                stop = numpy.array(["time","<","input[2]"])
+            flight,state = flight_segment(aircraft,MCL,nei,state,stop,input,dat,cmd,dof,cst,dt,flight,integrator)
 
-                flight,state = flight_segment(aircraft,MCR,nei,state,stop,input,dat,cmd,dof,cst,dt,flight)
+            altp = levels[i_up]
+            levels = levels[i_up+1:]
+            blocked = {}
 
-                dtime = dt
+            dtime = 0.  # Allows to continue climbing if best recheable altitude is not found for cruise start
 
         else:
 
-            # Go to next point
+            # Go to next point, with rk23 the cruise runs up to the predicted next decision
             #-----------------------------------------------------------------------------------------------------------
+            margins = sar - sar_levels[1:]
+            for i,(active_ceiling,active_vz) in blocked.items():
+                margins[i] = (vz_mcr_min,vz_mcl_min)[active_ceiling-1] - active_vz
+
             dt = 120.
+            if (integrator is not None and integrator.method=="rk23" and 0.<dtime):
+                dt = next_decision_time(margins,margins0,blocked,blocked0,dtime,
+                                        flight[-1,stop_idx]-stop_val,flight[-2,stop_idx]-stop_val,
+                                        flight[-1,xout_dict["time"]]-flight[-2,xout_dict["time"]],dt,integrator.dt_max)
+            margins0 = margins
+
             time_stop = state[state_dict["time"]] + dt
             input = numpy.array([altp,mach,time_stop])
             dat = numpy.array([])
@@ -461,7 +928,7 @@ def level_flight(aircraft,mach,vz_mcl_min,vz_mcr_min,heading,stop,flight):
             cst = numpy.array([["altp","input[0]"],["altp_d","0"],["mach","input[1]"],["mach_d","0"],["path_d","0"]])
             stop = numpy.array(["time","<","input[2]"])
 
-            flight,state = flight_segment(aircraft,MCR,nei,state,stop,input,dat,cmd,dof,cst,dt,flight)
+            flight,state = flight_segment(aircraft,MCR,nei,state,stop,input,dat,cmd,dof,cst,dt,flight,integrator)
 
             dtime = dt
 
@@ -473,7 +940,7 @@ def level_flight(aircraft,mach,vz_mcl_min,vz_mcr_min,heading,stop,flight):
                         *(stop_val - flight[n,stop_idx]) \
                         /(flight[n+1,stop_idx] - flight[n,stop_idx])
 
-    flight = flight[0:n+2,:]
+    flight.truncate(n+2)
     flight[n+1,:] = xout
     state = xout[0:6]
 
@@ -481,7 +948,30 @@ def level_flight(aircraft,mach,vz_mcl_min,vz_mcr_min,heading,stop,flight):
 
 
 #===========================================================================================================
-def standard_descent(aircraft,altp0,vcas1,altp1,vcas2,mach,flight):
+def next_decision_time(margins,margins0,blocked,blocked0,dtime,stop_gap,stop_gap0,stop_dtime,dt_min,dt_max):
+    """
+    Length of the next cruise segment of level_flight, between dt_min and dt_max
+    margins are the distances of each upper level to a step climb decision (SAR of altp minus SAR of the level,
+    or distance of the active ceiling to its minimum climb speed for the levels of blocked), margins0 are the values
+    at the previous decision made dtime before, each margin is extrapolated linearly to its next zero crossing,
+    so is the distance to the stop condition of level_flight (stop_gap and stop_gap0 taken stop_dtime apart)
+    """
+    time = [dt_max]
+    for i in range(len(margins)):
+        if ((i in blocked)!=(i in blocked0)):
+            return dt_min     # The kind of margin changed, no trend available
+        if (i in blocked and blocked[i][0]!=blocked0[i][0]):
+            return dt_min
+        rate = (margins[i]-margins0[i])/dtime
+        if (rate<0.):
+            time.append(-margins[i]/rate)
+    if (0.<stop_dtime and 0.<stop_gap*(stop_gap0-stop_gap)):
+        time.append(stop_gap*stop_dtime/(stop_gap0-stop_gap))
+    return min(max(min(time),dt_min),dt_max)
+
+
+#===========================================================================================================
+def standard_descent(aircraft,altp0,vcas1,altp1,vcas2,mach,flight,integrator=None):
     """
     Constant CAS climb :
     vcas1 from altp0 to altp1
@@ -490,6 +980,8 @@ def standard_descent(aircraft,altp0,vcas1,altp1,vcas2,mach,flight):
 
     # Initialize climb flight
     #-----------------------------------------------------------------------------------------------------------
+    flight = as_flight_history(flight)
+
     xout = flight[-1,:]
     state = xout[0:6]
     altp2 = xout[xout_dict["altp"]]
@@ -523,7 +1015,7 @@ def standard_descent(aircraft,altp0,vcas1,altp1,vcas2,mach,flight):
     stop = numpy.array(["altp",">","input[1]"])
     dt = 30.
 
-    flight,state = flight_segment(aircraft,FID,nei,state,stop,input,dat,cmd,dof,cst,dt,flight)
+    flight,state = flight_segment(aircraft,FID,nei,state,stop,input,dat,cmd,dof,cst,dt,flight,integrator)
 
     # First constant CAS descent segment
     #-----------------------------------------------------------------------------------------------------------
@@ -532,10 +1024,10 @@ def standard_descent(aircraft,altp0,vcas1,altp1,vcas2,mach,flight):
     cmd = numpy.array(["cz"])
     dof = numpy.array(["vgnd","path"])
     cst = numpy.array([["vcas","input[0]"],["vcas_d","0"],["path_d","0"]])
-    stop = numpy.array(["altp","<","input[1]"])
+    stop = numpy.array(["altp",">","input[1]"])
     dt = 30.
 
-    flight,state = flight_segment(aircraft,FID,nei,state,stop,input,dat,cmd,dof,cst,dt,flight)
+    flight,state = flight_segment(aircraft,FID,nei,state,stop,input,dat,cmd,dof,cst,dt,flight,integrator)
 
     # Deceleration at constant altitude
     #-----------------------------------------------------------------------------------------------------------
@@ -547,7 +1039,7 @@ def standard_descent(aircraft,altp0,vcas1,altp1,vcas2,mach,flight):
     stop = numpy.array(["vcas",">","input[1]"])
     dt = 5.
 
-    flight,state = flight_segment(aircraft,FID,nei,state,stop,input,dat,cmd,dof,cst,dt,flight)
+    flight,state = flight_segment(aircraft,FID,nei,state,stop,input,dat,cmd,dof,cst,dt,flight,integrator)
 
     # Second constant CAS descent segment
     #-----------------------------------------------------------------------------------------------------------
@@ -559,7 +1051,7 @@ def standard_descent(aircraft,altp0,vcas1,altp1,vcas2,mach,flight):
     stop = numpy.array(["altp",">","input[1]"])
     dt = 30.
 
-    flight,state = flight_segment(aircraft,FID,nei,state,stop,input,dat,cmd,dof,cst,dt,flight)
+    flight,state = flight_segment(aircraft,FID,nei,state,stop,input,dat,cmd,dof,cst,dt,flight,integrator)
 
     return flight,state
 
@@ -567,11 +1059,21 @@ def standard_descent(aircraft,altp0,vcas1,altp1,vcas2,mach,flight):
 #===========================================================================================================
 def qs_mission(aircraft,disa,tow,range,heading,
                altp0_clb,vcas1_clb,altp1_clb,vcas2_clb,altp2_clb,cruise_mach,
-               vcas2_dsc,altp1_dsc,vcas1_dsc,altp0_dsc,vz_mcr_min,vz_mcl_min):
+               vcas2_dsc,altp1_dsc,vcas1_dsc,altp0_dsc,vz_mcr_min,vz_mcl_min,integrator=None):
+    """
+    Quasi steady mission : climb, step cruise and descent over range, ground phases are added to block fuel and time
+    The cruise is flown over the whole range, the top of descent is then moved back along it until the descent
+    ends at range within tod_tol
+    Returns block fuel, block time and the flight history from climb start to descent end
+    A default Integrator is used if integrator is None so that flight point solves are warm started
+    """
 
     (MTO,MCN,MCL,MCR,FID) = aircraft.propulsion.rating_code
     nei = 0.
 
+    if (integrator is None):
+        integrator = Integrator()
+
     altp_cabin = cabin_virtual_altp()
 
     t = 0.
@@ -581,23 +1083,76 @@ def qs_mission(aircraft,disa,tow,range,heading,
     path = 0.
     state = numpy.array([t,tow,xg,zg,vgnd,path])
 
+    xin = numpy.array([aircraft.aerodynamics.cz_cruise_lod_max, aircraft.propulsion.mcl_thrust_ref])
+
     xout,state_d = state_dot(xin,state,MCL,nei,aircraft)
 
-    flight = numpy.vstack([[xout]])
+    flight = FlightHistory()
+    flight.append(xout)
 
-    flight,state = iso_cas_climb(aircraft,vcas1_clb,altp1_clb,vcas2_clb,altp2_clb,cruise_mach,vz_mcl_min,flight)
+    # Climb
+    #-----------------------------------------------------------------------------------------------------------
+    flight,state = iso_cas_climb(aircraft,vcas1_clb,altp1_clb,vcas2_clb,altp2_clb,cruise_mach,vz_mcl_min,flight,integrator)
 
+    n_climb = len(flight)
+
+    # Cruise over the whole range
+    #-----------------------------------------------------------------------------------------------------------
+    ceiling_cache = CeilingCache(aircraft,nei,cruise_mach,integrator=integrator)
 
     stop = numpy.array(["xg","<",str(range)])
 
-    flight,state = level_flight(aircraft,cruise_mach,vz_mcl_min,vz_mcr_min,heading,stop,flight)
+    flight,state = level_flight(aircraft,cruise_mach,vz_mcl_min,vz_mcr_min,heading,stop,flight,integrator,ceiling_cache)
+
+    # Top of descent, trial descents are flown from cruise points until the descent ends at range
+    #-----------------------------------------------------------------------------------------------------------
+    xg_idx = xout_dict["xg"]
+
+    xg_toc = flight[n_climb-1,xg_idx]
+    xg_tod = flight[-1,xg_idx]
+    miss = numpy.inf
+    n_trial = 0
+
+    while (tod_tol < numpy.abs(miss)):
+
+        if (n_trial==max_tod_trial):
+            raise Exception("qs_mission, top of descent cannot be located")
+
+        xg_tod = min(xg_tod + (miss if n_trial>0 else 0.), flight[-1,xg_idx])
 
+        if (xg_tod <= xg_toc):
+            raise Exception("qs_mission, range is too short to fit climb and descent")
 
-    flight,state = standard_descent(aircraft,altp0_dsc,vcas1_dsc,altp1_dsc,vcas2_dsc,cruise_mach,flight)
+        n = numpy.where(flight[:,xg_idx]<xg_tod)[0][-1]
 
+        xout = flight[n,:] + (flight[n+1,:]-flight[n,:]) \
+                            *(xg_tod - flight[n,xg_idx]) \
+                            /(flight[n+1,xg_idx] - flight[n,xg_idx])
 
+        descent,state = standard_descent(aircraft,altp0_dsc,vcas1_dsc,altp1_dsc,vcas2_dsc,cruise_mach,
+                                         as_flight_history(xout),integrator)
 
+        miss = range - descent[-1,xg_idx]
+        n_trial += 1
 
+    # Cut cruise at top of descent and append the descent
+    #-----------------------------------------------------------------------------------------------------------
+    flight.truncate(n+1)
+
+    for xout in descent.data:
+        flight.append(xout)
+
+    # Block fuel and time
+    #-----------------------------------------------------------------------------------------------------------
+    lw = state[state_dict["mass"]]
+
+    fuel_taxi_out,time_taxi_out,fuel_take_off,time_take_off = perfo.departure_ground_phases(aircraft,tow)
+    fuel_landing,time_landing,fuel_taxi_in,time_taxi_in = perfo.arrival_ground_phases(aircraft,lw)
+
+    block_fuel = fuel_taxi_out + fuel_take_off + (tow - lw) + fuel_landing + fuel_taxi_in
+    block_time = time_taxi_out + time_take_off + state[state_dict["time"]] + time_landing + time_taxi_in
+
+    return block_fuel,block_time,flight
 
 
 #===========================================================================================================
@@ -624,7 +1179,7 @@ def init_var(aircraft,state,cmd,dof):
 
 
 #===========================================================================================================
-def test_ceilings(aircraft,nei,mach,altp,state):
+def test_ceilings(aircraft,nei,mach,altp,state,integrator=None):
 
     state_copy = copy.copy(state)
 
@@ -638,38 +1193,111 @@ def test_ceilings(aircraft,nei,mach,altp,state):
 
     var = init_var(aircraft,state,cmd,dof)
 
-    xout,state,state_d = flight_point(aircraft,MCR,nei,state_copy,var,input,dat,cmd,dof,cst)
+    xout,state,state_d = flight_point(aircraft,MCR,nei,state_copy,var,input,dat,cmd,dof,cst,integrator)
     vz_mcr = xout[xout_dict["vzair"]]
 
     var = init_var(aircraft,state,cmd,dof)
 
-    xout,state,state_d = flight_point(aircraft,MCL,nei,state_copy,var,input,dat,cmd,dof,cst)
+    xout,state,state_d = flight_point(aircraft,MCL,nei,state_copy,var,input,dat,cmd,dof,cst,integrator)
     vz_mcl = xout[xout_dict["vzair"]]
 
     return vz_mcr,vz_mcl
 
 
+#--------------------------------------------------------------------------------------------------------------------------------
+class CeilingCache(object):
+    """
+    MCR and MCL vertical speeds of level flight points, solved once per flight level and mass node
+    Mass nodes are spaced by mass_step, vertical speeds at a given mass are interpolated between the two
+    surrounding nodes of the same level
+    """
+    def __init__(self, aircraft = None,
+                       nei = 0.,
+                       mach = None,
+                       mass_step = 500.,
+                       integrator = None):
+        """
+        Constructor :
+            :param aircraft: Uu Aircraft - OoM 10^0 - Aircraft whose ceilings are tested
+            :param nei: Uu int - OoM 10^0 - Number of engines inoperative
+            :param mach: Uu mach - OoM 10^0 - Cruise Mach number
+            :param mass_step: Uu kg - OoM 10^2 - Spacing of mass nodes
+            :param integrator: Uu Integrator - OoM 10^0 - Optional, counts residual evaluations of ceiling solves
+            :param n_hit: Uu int - OoM 10^1 - Number of mass nodes found in the cache
+            :param n_miss: Uu int - OoM 10^1 - Number of mass nodes solved
+        """
+        self.aircraft = aircraft
+        self.nei = nei
+        self.mach = mach
+        self.mass_step = mass_step
+        self.integrator = integrator
+        self.data = {}
+        self.n_hit = 0
+        self.n_miss = 0
+
+    def node(self,altp,k,state):
+        key = (k,round(float(altp),3))
+        vz = self.data.get(key)
+        if vz is None:
+            self.n_miss += 1
+            node_state = numpy.array(state, dtype=float)
+            node_state[state_dict["mass"]] = k*self.mass_step
+            try:
+                vz = numpy.array(test_ceilings(self.aircraft,self.nei,self.mach,altp,node_state,self.integrator))
+            except Exception:
+                vz = numpy.array([-numpy.inf,-numpy.inf])     # Level flight point cannot be solved, level is out of reach
+            self.data[key] = vz
+        else:
+            self.n_hit += 1
+        return vz
+
+    def ceilings(self,altp,state):
+        """
+        Vertical speeds vz_mcr,vz_mcl at level altp and at the mass of state
+        """
+        x = state[state_dict["mass"]]/self.mass_step
+        k = int(numpy.floor(x))
+        vz0 = self.node(altp,k,state)
+        vz1 = self.node(altp,k+1,state)
+        if not (numpy.all(numpy.isfinite(vz0)) and numpy.all(numpy.isfinite(vz1))):
+            return -numpy.inf,-numpy.inf
+        vz = vz0 + (vz1-vz0)*(x-k)
+        return vz[0],vz[1]
+
+
 #===========================================================================================================
-def test_air_range(aircraft,rating,nei,mach,altp,altp_up,state):
+def level_air_range(aircraft,rating,nei,mach,altp,disa,mass):
+    """
+    Specific air range of steady level flight points, altp, disa and mass can be numpy arrays
+    Level flight equilibrium has an explicit solution : lift balances weight and thrust balances drag
+    """
 
-    state_copy = copy.copy(state)
+    g = earth.gravity()
 
-    dat = numpy.array([])
-    cmd = numpy.array(["cz","fn"])
-    dof = numpy.array(["zg","vgnd","path"])
-    cst = numpy.array([["altp","input[0]"],["altp_d","0"],["mach","input[1]"],["mach_d","0"],["path_d","0"]])
+    pamb,tamb,tstd,dtodz = earth.atmosphere(altp,disa)
 
-    var = init_var(aircraft,state,cmd,dof)
+    rho,sig = earth.air_density(pamb,tamb)
+    vair = mach*earth.sound_speed(tamb)
 
-    input = numpy.array([altp,mach])
-    xout,state,state_d = flight_point(aircraft,rating,nei,state_copy,var,input,dat,cmd,dof,cst)
-    sar = - state_d[state_dict["xg"]] / state_d[state_dict["mass"]]
+    qs = 0.5*rho*vair**2*aircraft.wing.area
 
-    var = init_var(aircraft,state,cmd,dof)
+    cz = mass*g/qs
+    cx,lod = airplane_aero.drag(aircraft,pamb,tamb,mach,cz)
+    fn = qs*cx
 
-    input = numpy.array([altp_up,mach])
-    xout_up,state_up,state_d_up = flight_point(aircraft,rating,nei,state_copy,var,input,dat,cmd,dof,cst)
-    sar_up = - state_d_up[state_dict["xg"]] / state_d_up[state_dict["mass"]]
+    sfc = propu.sfc(aircraft,pamb,tamb,mach,rating,nei)
 
-    return sar,sar_up
+    sar = vair/(sfc*fn)
+
+    return sar
+
+
+#===========================================================================================================
+def test_air_range(aircraft,rating,nei,mach,altp,altp_up,state):
+
+    disa = 0.   # Consistent with air()
+    mass = state[state_dict["mass"]]
 
+    sar,sar_up = level_air_range(aircraft,rating,nei,mach,numpy.array([altp,altp_up]),disa,mass)
+
+    return sar,sar_up
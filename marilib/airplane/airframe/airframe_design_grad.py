@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jan 24 23:22:21 2019
+
+@author: DRUOT Thierry : original Scilab implementation
+         PETEILH Nicolas : portage to Python
+"""
+
+import numpy
+
+from marilib.aircraft_model.airplane import aerodynamics as airplane_aero
+
+
+#===========================================================================================================
+def eval_wing_mass_grad(aircraft,mtow,mtow_d,mzfw,mzfw_d):
+    """
+    Wing mass and its derivative with respect to characteristic weights
+    Wing geometry is taken as given
+    """
+
+    aerodynamics = aircraft.aerodynamics
+
+    wing = aircraft.wing
+
+    (cz_max_ld,cz0) = airplane_aero.high_lift(wing, aerodynamics.hld_conf_ld)
+
+    A = 32*wing.area**1.1
+    B = 4*wing.span**2 * numpy.sqrt(mtow*mzfw)
+    B_d = 2*wing.span**2 * (mtow_d*mzfw + mtow*mzfw_d)/numpy.sqrt(mtow*mzfw)
+    C = 1.1e-6*(1+2*wing.aspect_ratio)/(1+wing.aspect_ratio)
+    D = (0.6*wing.t_o_c_r+0.3*wing.t_o_c_k+0.1*wing.t_o_c_t) * (wing.area/wing.span)
+    E = numpy.cos(wing.sweep)**2
+    F = 1200*(cz_max_ld - 1.8)**1.5
+
+    mass = A + (B*C)/(D*E) + F   # Shevell formula + high lift device regression
+    mass_d = (B_d*C)/(D*E)
+
+    return mass,mass_d
+
+
+#===========================================================================================================
+def eval_landing_gear_mass_grad(aircraft,mtow,mtow_d,mlw,mlw_d):
+    """
+    Landing Gears mass and its derivative with respect to characteristic weights
+    """
+
+    mass = 0.02*mtow**1.03 + 0.012*mlw    # Landing gears
+    mass_d = 0.0206*mtow**0.03*mtow_d + 0.012*mlw_d
+
+    return mass,mass_d
@@ -7,6 +7,8 @@ Created on Thu Jan 24 23:22:21 2019
          PETEILH Nicolas : portage to Python
 """
 
+import math
+import bisect
 import numpy
 
 from scipy.optimize import fsolve
@@ -112,9 +114,10 @@ def reynolds_number_Sutherland(pamb,tamb,mach):
 
 
 #===========================================================================================================
-def atmosphere(altp,disa):
+def standard_layers():
     """
-    Pressure from pressure altitude from ground to 50 km
+    Standard atmosphere layer table from ground to 50 km
+    Base altitude, base temperature, base pressure and temperature gradient of each layer
     """
     g = gravity()
     R = gaz_constant()
@@ -125,18 +128,159 @@ def atmosphere(altp,disa):
     P = numpy.array([sea_level_pressure(), 0., 0., 0., 0., 0.])
     T = numpy.array([sea_level_temperature(), 0., 0., 0., 0., 0.])
 
-    if (Z[-1]<altp):
-        raise Exception("atmosphere, altitude cannot exceed 50km")
-
-    j = 0
-
-    while (Z[1+j]<=altp):
+    for j in range(len(dtodz)):
         T[j+1] = T[j] + dtodz[j]*(Z[j+1]-Z[j])
         if (0.<numpy.abs(dtodz[j])):
             P[j+1] = P[j]*(1 + (dtodz[j]/T[j])*(Z[j+1]-Z[j]))**(-g/(R*dtodz[j]))
         else:
             P[j+1] = P[j]*numpy.exp(-(g/R)*((Z[j+1]-Z[j])/T[j]))
-        j = j + 1
+
+    return Z,T,P,dtodz
+
+
+# Layer table is built once and shared by all atmosphere functions
+layer_altp, layer_tstd, layer_pamb, layer_dtodz = standard_layers()
+
+# Inner layer boundaries used for scalar layer look up
+layer_altp_bounds = list(layer_altp[1:-1])
+layer_pamb_bounds = list(-layer_pamb[1:-1])
+
+# Element wise version of math.pow, numpy.power may differ from it by one ulp on some processors
+math_power = numpy.frompyfunc(math.pow,2,1)
+
+
+#===========================================================================================================
+def layer_power(x,y):
+    """
+    Element wise power giving the same bits as the scalar operator
+    """
+    return numpy.asarray(math_power(x,y), dtype=float)
+
+
+#===========================================================================================================
+def standard_layers_geo(disa):
+    """
+    Atmosphere layer table in geometric altitude from ground to 50 km
+    Layer thicknesses and temperature gradients depend on the temperature shift
+    disa can be an array, one table row is built for each of its values
+    """
+    g = gravity()
+    R = gaz_constant()
+
+    Zi = numpy.array([0., 11000., 20000.,32000., 47000., 50000.])
+    dtodzi = numpy.array([-0.0065, 0., 0.0010, 0.0028, 0.])
+
+    disa = numpy.asarray(disa, dtype=float)
+    shape = disa.shape + (len(Zi),)
+
+    Z = numpy.zeros(shape)
+    dtodz = numpy.zeros(shape[:-1]+(len(dtodzi),))
+
+    P = numpy.zeros(shape)
+    T = numpy.zeros(shape)
+    P[...,0] = sea_level_pressure()
+    T[...,0] = sea_level_temperature()
+
+    K = 1 + disa/T[...,0]
+    dtodz[...,0] = dtodzi[0]/K
+    Z[...,1] = Z[...,0] + (Zi[1]-Zi[0])*K
+
+    for j in range(len(dtodzi)-1):
+        T[...,j+1] = T[...,j] + dtodz[...,j]*(Z[...,j+1]-Z[...,j])
+        if (0.<numpy.abs(dtodzi[j])):
+            P[...,j+1] = P[...,j]*layer_power(1 + (dtodz[...,j]/(T[...,j]+disa))*(Z[...,j+1]-Z[...,j]),
+                                              -g/(R*dtodz[...,j]))
+        else:
+            P[...,j+1] = P[...,j]*numpy.exp(-(g/R)*((Z[...,j+1]-Z[...,j])/(T[...,j]+disa)))
+        K = 1 + disa/T[...,j+1]
+        dtodz[...,j+1] = dtodzi[j+1]/K
+        Z[...,j+2] = Z[...,j+1] + (Zi[j+2]-Zi[j+1])*K
+
+    return Z,T,P,dtodz
+
+
+# Geometric layer tables already built, indexed by temperature shift
+layer_geo_cache = {}
+
+
+#===========================================================================================================
+def is_array(x):
+    """
+    True if x must be processed by the array versions of atmosphere functions
+    Size 1 arrays, as passed by fsolve, are processed as scalars, see scalar_shape
+    """
+    return isinstance(x,(numpy.ndarray,list,tuple)) and (numpy.size(x)!=1)
+
+
+#===========================================================================================================
+def scalar_shape(*args):
+    """
+    Broadcast shape of the size 1 arrays among args, None if all args are plain scalars
+    """
+    ndim = -1
+    for x in args:
+        if isinstance(x,(numpy.ndarray,list,tuple)):
+            ndim = max(ndim,numpy.ndim(x))
+    if (ndim<0):
+        return None
+    return (1,)*ndim
+
+
+#===========================================================================================================
+def as_float(x):
+    """
+    Python float of a scalar or of a size 1 array
+    """
+    if isinstance(x,numpy.ndarray):
+        return float(x.item())
+    if isinstance(x,(list,tuple)):
+        return float(numpy.ravel(x)[0])
+    return float(x)
+
+
+#===========================================================================================================
+def with_shape(shape,values):
+    """
+    Scalar results given back as arrays of shape
+    """
+    return tuple([numpy.array(v, dtype=float).reshape(shape) for v in values])
+
+
+#===========================================================================================================
+def layer_geo(disa):
+    """
+    Cached geometric layer table for a scalar temperature shift
+    """
+    key = float(disa)
+    if key not in layer_geo_cache:
+        if (256<len(layer_geo_cache)):
+            layer_geo_cache.clear()
+        layer_geo_cache[key] = standard_layers_geo(key)
+    return layer_geo_cache[key]
+
+
+#===========================================================================================================
+def atmosphere(altp,disa):
+    """
+    Pressure from pressure altitude from ground to 50 km
+    altp and disa can be numpy arrays, outputs are then arrays of the broadcast shape
+    """
+    if (is_array(altp) or is_array(disa)):
+        return atmosphere_vect(altp,disa)
+
+    shape = scalar_shape(altp,disa)
+    if (shape is not None):
+        return with_shape(shape,atmosphere(as_float(altp),as_float(disa)))
+
+    g = gravity()
+    R = gaz_constant()
+
+    Z,T,P,dtodz = layer_altp,layer_tstd,layer_pamb,layer_dtodz
+
+    if (Z[-1]<altp):
+        raise Exception("atmosphere, altitude cannot exceed 50km")
+
+    j = bisect.bisect_right(layer_altp_bounds, altp)
 
     if (0.<numpy.abs(dtodz[j])):
         pamb = P[j]*(1 + (dtodz[j]/T[j])*(altp-Z[j]))**(-g/(R*dtodz[j]))
@@ -148,6 +292,55 @@ def atmosphere(altp,disa):
     return pamb,tamb,tstd,dtodz[j]
 
 
+#===========================================================================================================
+def atmosphere_vect(altp,disa):
+    """
+    Pressure from pressure altitude from ground to 50 km, array version of atmosphere
+    Layers are found by table look up, results are identical to the scalar function
+    """
+    g = gravity()
+    R = gaz_constant()
+
+    altp,disa = numpy.broadcast_arrays(numpy.asarray(altp, dtype=float), numpy.asarray(disa, dtype=float))
+
+    Z,T,P,dtodz = layer_altp,layer_tstd,layer_pamb,layer_dtodz
+
+    if (numpy.any(Z[-1]<altp)):
+        raise Exception("atmosphere, altitude cannot exceed 50km")
+
+    j = numpy.searchsorted(Z[1:-1], altp, side="right")
+
+    pamb = pressure_in_layer(altp,Z[j],T[j],P[j],dtodz[j],0.)
+    tstd = T[j] + dtodz[j]*(altp-Z[j])
+    tamb = tstd + disa
+
+    return pamb,tamb,tstd,dtodz[j]
+
+
+#===========================================================================================================
+def pressure_in_layer(alt,Zj,Tj,Pj,dtodzj,disa):
+    """
+    Pressure inside layers given by base altitude, temperature, pressure and temperature gradient arrays
+    """
+    g = gravity()
+    R = gaz_constant()
+
+    pamb = numpy.empty(numpy.shape(alt))
+
+    grad = (0.<numpy.abs(dtodzj))
+    iso = numpy.logical_not(grad)
+
+    Tj = Tj + disa*numpy.ones(numpy.shape(alt))
+
+    if (numpy.any(grad)):
+        pamb[grad] = Pj[grad]*layer_power(1 + (dtodzj[grad]/Tj[grad])*(alt[grad]-Zj[grad]),
+                                          -g/(R*dtodzj[grad]))
+    if (numpy.any(iso)):
+        pamb[iso] = Pj[iso]*numpy.exp(-(g/R)*((alt[iso]-Zj[iso])/Tj[iso]))
+
+    return pamb
+
+
 #===========================================================================================================
 def altg_from_altp(altp,disa):
 
@@ -167,40 +360,25 @@ def altg_from_altp(altp,disa):
 def atmosphere_geo(altg,disa):
     """
     Pressure from pressure altitude from ground to 50 km
+    altg and disa can be numpy arrays, outputs are then arrays of the broadcast shape
     """
-    g = gravity()
-    R = gaz_constant()
-
-    Zi = numpy.array([0., 11000., 20000.,32000., 47000., 50000.])
-    dtodzi = numpy.array([-0.0065, 0., 0.0010, 0.0028, 0.])
+    if (is_array(altg) or is_array(disa)):
+        return atmosphere_geo_vect(altg,disa)
 
-    Z = numpy.array([0., 0., 0., 0., 0., 0.])
-    dtodz = numpy.array([0., 0., 0., 0., 0.])
+    shape = scalar_shape(altg,disa)
+    if (shape is not None):
+        return with_shape(shape,atmosphere_geo(as_float(altg),as_float(disa)))
 
-    P = numpy.array([sea_level_pressure(), 0., 0., 0., 0., 0.])
-    T = numpy.array([sea_level_temperature(), 0., 0., 0., 0., 0.])
-
-    K = 1 + disa/T[0]
-    dtodz[0] = dtodzi[0]/K
-    Z[1] = Z[0] + (Zi[1]-Zi[0])*K
+    g = gravity()
+    R = gaz_constant()
 
-    n = len(P)-1
-    j = 0
+    Z,T,P,dtodz = layer_geo(disa)
 
-    while (j<n and Z[1+j]<=altg):
-        T[j+1] = T[j] + dtodz[j]*(Z[j+1]-Z[j])
-        if (0.<numpy.abs(dtodz[j])):
-            P[j+1] = P[j]*(1 + (dtodz[j]/(T[j]+disa))*(Z[j+1]-Z[j]))**(-g/(R*dtodz[j]))
-        else:
-            P[j+1] = P[j]*numpy.exp(-(g/R)*((Z[j+1]-Z[j])/(T[j]+disa)))
-        j = j + 1
-        K = 1 + disa/T[j]
-        dtodz[j] = dtodzi[j]/K
-        Z[j+1] = Z[j] + (Zi[j+1]-Zi[j])*K
-
-    if (Z[1+j]<altg):
+    if (Z[-1]<altg):
         raise Exception("atmosphere_geo, altitude cannot exceed 50km")
 
+    j = bisect.bisect_right(list(Z[1:-1]), altg)
+
     if (0.<numpy.abs(dtodz[j])):
         pamb = P[j]*(1 + (dtodz[j]/(T[j]+disa))*(altg-Z[j]))**(-g/(R*dtodz[j]))
     else:
@@ -210,40 +388,74 @@ def atmosphere_geo(altg,disa):
     return pamb,tamb,dtodz[j]
 
 
+#===========================================================================================================
+def atmosphere_geo_vect(altg,disa):
+    """
+    Pressure from geometric altitude from ground to 50 km, array version of atmosphere_geo
+    """
+    altg,disa = numpy.broadcast_arrays(numpy.asarray(altg, dtype=float), numpy.asarray(disa, dtype=float))
+
+    Z,T,P,dtodz = standard_layers_geo(disa)
+
+    if (numpy.any(Z[...,-1]<altg)):
+        raise Exception("atmosphere_geo, altitude cannot exceed 50km")
+
+    j = numpy.sum(Z[...,1:-1]<=altg[...,None], axis=-1)[...,None]
+
+    Zj = numpy.take_along_axis(Z,j,axis=-1)[...,0]
+    Tj = numpy.take_along_axis(T,j,axis=-1)[...,0]
+    Pj = numpy.take_along_axis(P,j,axis=-1)[...,0]
+    dtodzj = numpy.take_along_axis(dtodz,j,axis=-1)[...,0]
+
+    pamb = pressure_in_layer(altg,Zj,Tj,Pj,dtodzj,disa)
+    tamb = Tj + dtodzj*(altg-Zj) + disa
+
+    return pamb,tamb,dtodzj
+
+
 #===========================================================================================================
 def pressure_altitude(pamb):
     """
     Pressure altitude from ground to 50 km
+    pamb can be a numpy array, output is then an array of the same shape
     """
     g = gravity()
     R = gaz_constant()
 
-    Z = numpy.array([0., 11000., 20000.,32000., 47000., 50000.])
-    dtodz = numpy.array([-0.0065, 0., 0.0010, 0.0028, 0.])
+    Z,T,P,dtodz = layer_altp,layer_tstd,layer_pamb,layer_dtodz
 
-    P = numpy.array([sea_level_pressure(), 0., 0., 0., 0., 0.])
-    T = numpy.array([sea_level_temperature(), 0., 0., 0., 0., 0.])
+    shape = scalar_shape(pamb)
+    if (shape is not None and numpy.size(pamb)==1):
+        return numpy.array(pressure_altitude(as_float(pamb)), dtype=float).reshape(shape)
 
-    j = 0
-    n = len(P)-1
-    P[1] = P[0]*(1 + (dtodz[0]/T[0])*(Z[1]-Z[0]))**(-g/(R*dtodz[0]))
-    T[1] = T[0] + dtodz[0]*(Z[1]-Z[0])
-
-    while (j<n and pamb<P[j+1]):
-        j = j + 1
-        T[j+1] = T[j] + dtodz[j]*(Z[j+1]-Z[j])
+    if (not is_array(pamb)):
+        if (pamb<P[-1]):
+            raise Exception("pressure_altitude, altitude cannot exceed 50km")
+        j = bisect.bisect_left(layer_pamb_bounds, -pamb)
         if (0.<numpy.abs(dtodz[j])):
-            P[j+1] = P[j]*(1 + (dtodz[j]/T[j])*(Z[j+1]-Z[j]))**(-g/(R*dtodz[j]))
+            altp = Z[j] + ((pamb/P[j])**(-(R*dtodz[j])/g) - 1)*(T[j]/dtodz[j])
         else:
-            P[j+1] = P[j]*numpy.exp(-(g/R)*((Z[j+1]-Z[j])/T[j]))
+            altp = Z[j] - (T[j]/(g/R))*numpy.log(pamb/P[j])
+        return altp
+
+    pamb = numpy.asarray(pamb, dtype=float)
 
-    if (pamb<P[j+1]):
+    if (numpy.any(pamb<P[-1])):
         raise Exception("pressure_altitude, altitude cannot exceed 50km")
 
-    if (0.<numpy.abs(dtodz[j])):
-        altp = Z[j] + ((pamb/P[j])**(-(R*dtodz[j])/g) - 1)*(T[j]/dtodz[j])
-    else:
-        altp = Z[j] - (T[j]/(g/R))*numpy.log(pamb/P[j])
+    j = numpy.searchsorted(-P[1:-1], -pamb, side="left")
+
+    altp = numpy.empty(pamb.shape)
+
+    grad = (0.<numpy.abs(dtodz[j]))
+    iso = numpy.logical_not(grad)
+
+    Zj,Tj,Pj,dtodzj = Z[j],T[j],P[j],dtodz[j]
+
+    if (numpy.any(grad)):
+        altp[grad] = Zj[grad] + (layer_power(pamb[grad]/Pj[grad], -(R*dtodzj[grad])/g) - 1)*(Tj[grad]/dtodzj[grad])
+    if (numpy.any(iso)):
+        altp[iso] = Zj[iso] - (Tj[iso]/(g/R))*numpy.log(pamb[iso]/Pj[iso])
 
     return altp
 
@@ -252,33 +464,9 @@ def pressure_altitude(pamb):
 def pressure(altp):
     """
     Pressure from pressure altitude from ground to 50 km
+    altp can be a numpy array, output is then an array of the same shape
     """
-    g = gravity()
-    R = gaz_constant()
-
-    Z = numpy.array([0., 11000., 20000.,32000., 47000., 50000.])
-    dtodz = numpy.array([-0.0065, 0., 0.0010, 0.0028, 0.])
-
-    P = numpy.array([sea_level_pressure(), 0., 0., 0., 0., 0.])
-    T = numpy.array([sea_level_temperature(), 0., 0., 0., 0., 0.])
-
-    if (Z[-1]<altp):
-        raise Exception("pressure, altitude cannot exceed 50km")
-
-    j = 0
-
-    while (Z[1+j]<=altp):
-        T[j+1] = T[j] + dtodz[j]*(Z[j+1]-Z[j])
-        if (0.<numpy.abs(dtodz[j])):
-            P[j+1] = P[j]*(1 + (dtodz[j]/T[j])*(Z[j+1]-Z[j]))**(-g/(R*dtodz[j]))
-        else:
-            P[j+1] = P[j]*numpy.exp(-(g/R)*((Z[j+1]-Z[j])/T[j]))
-        j = j + 1
-
-    if (0.<numpy.abs(dtodz[j])):
-        pamb = P[j]*(1 + (dtodz[j]/T[j])*(altp-Z[j]))**(-g/(R*dtodz[j]))
-    else:
-        pamb = P[j]*numpy.exp(-(g/R)*((altp-Z[j])/T[j]))
+    pamb,tamb,tstd,dtodz = atmosphere(altp,0.)
 
     return pamb
 
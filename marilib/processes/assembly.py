@@ -8,12 +8,18 @@ Created on Thu Jan 24 23:22:21 2019
 Changed name from "design.py" to "assembly.py" on 21:05:2019
 """
 
+import copy
 import numpy as np
-from scipy.optimize import fsolve,minimize,SR1, NonlinearConstraint,BFGS
+from scipy.optimize import fsolve,minimize,SR1, NonlinearConstraint,BFGS, OptimizeResult
 from marilib.tools import units as unit
+from marilib.tools.cache import EvalCache
+from marilib.tools.jacobian import FdJacobian
+from marilib.tools.warm_start import WarmStart
+from marilib.tools.surrogate import RbfSurrogate, latin_hypercube
 
 from marilib.earth import environment as earth
 from marilib.aircraft_model.airplane import airplane_design as airplane, regulation as regul
+from marilib.aircraft_model.airplane import airplane_design_grad as airplane_grad
 
 from marilib.airplane.airframe import airframe_design as airframe
 
@@ -21,8 +27,53 @@ from marilib.airplane.propulsion import propulsion_design as propulsion
 
 from marilib.aircraft_model.operations import handling_qualities as h_q, \
                                               mission as perfo
+from marilib.aircraft_model.operations import mission_grad as perfo_grad
 
 from marilib.processes import component as sub_proc, initialization as init
+from marilib.processes.sweep import default_outputs, get_attribute
+
+# Set coupling_store.enabled = True to seed each coupling solve from the nearest converged design and record statistics
+# Converged coupling variables and solve statistics of the MDA coupling loops
+# Set coupling_store.enabled = True to seed each coupling solve from the nearest converged design
+coupling_store = WarmStart()
+
+# Number of coupling solves that did not converge, by solver name, always counted whatever coupling_store.enabled
+coupling_failures = {}
+
+
+#===========================================================================================================
+def record_coupling(name,key,output_dict):
+    """
+    Count a coupling solve that did not converge and store its solution in coupling_store
+    output_dict is the result of a fsolve call made with full_output=True
+    """
+
+    if (output_dict[2]!=1):
+        coupling_failures[name] = coupling_failures.get(name,0) + 1
+
+    coupling_store.record(name,key,output_dict)
+
+    return
+
+
+#===========================================================================================================
+def design_key(aircraft):
+    """
+    Design drivers used to look for the nearest converged design in coupling_store
+    """
+
+    if (aircraft.propulsion.architecture==4):
+        reference_thrust = aircraft.turboprop_engine.reference_thrust
+    else:
+        reference_thrust = aircraft.turbofan_engine.reference_thrust
+
+    key = np.array([reference_thrust,
+                    aircraft.wing.area,
+                    aircraft.design_driver.design_range,
+                    aircraft.design_driver.cruise_mach,
+                    aircraft.cabin.n_pax_ref])
+
+    return key
 
 
 #===========================================================================================================
@@ -208,10 +259,15 @@ def eval_aircraft_pre_design(aircraft):
 
     x_ini = np.array([nacelle_width_i,nacelle_y_ext_i])
 
+    key = design_key(aircraft)
+    x_ini = coupling_store.guess("pre_design",key,x_ini)
+
     fct_arg = aircraft
 
     output_dict = fsolve(fct_aircraft_pre_design, x0=x_ini, args=fct_arg, full_output=True)
 
+    record_coupling("pre_design",key,output_dict)
+
     aircraft.turbofan_nacelle.width = output_dict[0][0]                         # Coupling variable
     aircraft.turbofan_nacelle.y_ext = output_dict[0][1]                         # Coupling variable
 
@@ -274,12 +330,34 @@ def eval_mass_estimation(aircraft):
         return y_out
     #-----------------------------------------------------------------------------------------------------------
 
+    #===========================================================================================================
+    def fct_mass_d(x_in,aircraft):
+
+        mtow = aircraft.weights.mtow
+        mtow_d = np.array([0.,0.])
+        mlw_d = np.array([1.,0.])
+        mzfw_d = np.array([0.,1.])
+
+        owe,owe_d, cst_1,cst_1_d, cst_2,cst_2_d \
+            = airplane_grad.eval_aircraft_weights_grad(aircraft,mtow,mtow_d,x_in[0],mlw_d,x_in[1],mzfw_d)
+
+        y_out_d = np.array([cst_1_d,
+                            cst_2_d])
+
+        return y_out_d
+    #-----------------------------------------------------------------------------------------------------------
+
     x_ini = np.array([aircraft.weights.mlw,
                       aircraft.weights.mzfw])
 
+    key = design_key(aircraft)
+    x_ini = coupling_store.guess("mass",key,x_ini)
+
     fct_arg = aircraft
 
-    output_dict = fsolve(fct_mass, x0=x_ini, args=fct_arg, full_output=True)
+    output_dict = fsolve(fct_mass, x0=x_ini, args=fct_arg, fprime=fct_mass_d, full_output=True)
+
+    record_coupling("mass",key,output_dict)
 
     aircraft.weights.mlw = output_dict[0][0]                          # Coupling variable
     aircraft.weights.mzfw = output_dict[0][1]                         # Coupling variable
@@ -319,13 +397,49 @@ def eval_mass_mission_adaptation(aircraft):
         return y_out
     #-----------------------------------------------------------------------------------------------------------
 
+    #===========================================================================================================
+    def fct_mass_mission_d(x_in,aircraft):
+
+        mtow_d = np.array([1.,0.,0.])
+        mlw_d = np.array([0.,1.,0.])
+        mzfw_d = np.array([0.,0.,1.])
+
+        # Mass
+        #------------------------------------------------------------------------------------------------------
+        owe,owe_d, cst_1,cst_1_d, cst_2,cst_2_d \
+            = airplane_grad.eval_aircraft_weights_grad(aircraft,x_in[0],mtow_d,x_in[1],mlw_d,x_in[2],mzfw_d)
+
+        # Mission, see eval_nominal_mission
+        #------------------------------------------------------------------------------------------------------
+        disa = 0
+        altp = aircraft.design_driver.ref_cruise_altp
+        mach = aircraft.design_driver.cruise_mach
+        range = aircraft.design_driver.design_range
+
+        block_fuel,block_fuel_d, block_time,block_time_d, total_fuel,total_fuel_d \
+            = perfo_grad.mission_grad(aircraft,range,x_in[0],mtow_d,altp,mach,disa)
+
+        cst_3_d = mtow_d - owe_d - total_fuel_d
+
+        y_out_d = np.array([cst_1_d,
+                            cst_2_d,
+                            cst_3_d])
+
+        return y_out_d
+    #-----------------------------------------------------------------------------------------------------------
+
     x_ini = np.array([aircraft.weights.mtow,
                       aircraft.weights.mlw,
                       aircraft.weights.mzfw])
 
+    key = design_key(aircraft)
+    x_ini = coupling_store.guess("mass_mission",key,x_ini)
+
     fct_arg = aircraft
 
-    output_dict = fsolve(fct_mass_mission, x0=x_ini, args=fct_arg, full_output=True)
+    output_dict = fsolve(fct_mass_mission, x0=x_ini, args=fct_arg, fprime=fct_mass_mission_d, full_output=True)
+
+    record_coupling("mass_mission",key,output_dict)
 
     aircraft.weights.mtow = output_dict[0][0]                         # Coupling variable
     aircraft.weights.mlw = output_dict[0][1]                          # Coupling variable
@@ -549,10 +663,15 @@ def eval_hq0(aircraft):
                       aircraft.horizontal_tail.area * 1.05,     # Down scaling initial HTP area reduces the number of convergence problems ...
                       aircraft.vertical_tail.area])
 
+    key = design_key(aircraft)
+    x_ini = coupling_store.guess("hq0",key,x_ini)
+
     fct_arg = aircraft
 
     output_dict = fsolve(fct_hq_optim, x0=x_ini, args=fct_arg, full_output=True)
 
+    record_coupling("hq0",key,output_dict)
+
     if (output_dict[2]!=1):
         print(output_dict[3])
         raise Exception("Convergence problem in HQ optimization")
@@ -644,10 +763,15 @@ def eval_mda3(aircraft):
                       aircraft.horizontal_tail.area * 1.05,     # Down scaling initial HTP area reduces the number of convergence problems ...
                       aircraft.vertical_tail.area])
 
+    key = design_key(aircraft)
+    x_ini = coupling_store.guess("hq_optim",key,x_ini)
+
     fct_arg = aircraft
 
     output_dict = fsolve(fct_hq_optim, x0=x_ini, args=fct_arg, full_output=True)
 
+    record_coupling("hq_optim",key,output_dict)
+
     if (output_dict[2]!=1):
         raise Exception("Convergence problem in HQ optimization")
 
@@ -662,9 +786,9 @@ def eval_mda3(aircraft):
 
 
 #===========================================================================================================
-def eval_optim_data(x_in,ac,crit_index,crit_ref):
+def set_design_vector(x_in,ac):
     """
-    Compute criterion and constraints
+    Load design variables into the aircraft : engine reference thrust and wing area
     """
 
     if (ac.propulsion.architecture==1):
@@ -688,10 +812,60 @@ def eval_optim_data(x_in,ac,crit_index,crit_ref):
 
     ac.wing.area = x_in[1]
 
-    # Run MDA
-    #------------------------------------------------------------------------------------------------------
+    return
 
-    eval_mda2(ac)
+
+#===========================================================================================================
+def get_design_vector(ac):
+    """
+    Retrieve design variables from the aircraft : engine reference thrust and wing area
+    """
+
+    if (ac.propulsion.architecture==1):
+        x_out = (ac.turbofan_engine.reference_thrust,ac.wing.area)
+    elif (ac.propulsion.architecture==2):
+        x_out = (ac.turbofan_engine.reference_thrust,ac.wing.area)
+    elif (ac.propulsion.architecture==3):
+        x_out = (ac.turbofan_engine.reference_thrust,ac.wing.area)
+    elif (ac.propulsion.architecture==4):
+        x_out = (ac.turboprop_engine.reference_thrust,ac.wing.area)
+    else:
+        raise Exception("propulsion.architecture index is out of range")
+
+    return x_out
+
+
+# Criteria in the order of the criteria vector, see get_optim_data
+criterion_names = ("MTOW","block_fuel","CO2_metric","COC","DOC")
+
+
+#===========================================================================================================
+def criterion_index(criterion):
+    """
+    Position of a criterion in the criteria vector, see get_optim_data
+    """
+
+    if (criterion=="MTOW"):
+        crit_index = 0
+    elif (criterion=="block_fuel"):
+        crit_index = 1
+    elif (criterion=="CO2_metric"):
+        crit_index = 2
+    elif (criterion=="COC"):
+        crit_index = 3
+    elif (criterion=="DOC"):
+        crit_index = 4
+    else:
+        raise Exception("Criterion name is unknown")
+
+    return crit_index
+
+
+#===========================================================================================================
+def get_optim_data(ac):
+    """
+    Retrieve all criteria and constraints from an evaluated aircraft
+    """
 
     # Constraints are violated if negative
     #------------------------------------------------------------------------------------------------------
@@ -719,18 +893,113 @@ def eval_optim_data(x_in,ac,crit_index,crit_ref):
     crt[3] = ac.economics.cash_operating_cost
     crt[4] = ac.economics.direct_operating_cost
 
+    return crt,cst
+
+
+#===========================================================================================================
+def optim_record(x_in,crt,cst,ac,outputs=default_outputs):
+    """
+    Database row of an evaluated design : design vector, criteria, constraints, feasibility and selected outputs
+    """
+
+    row = {}
+
+    for i,x in enumerate(x_in):
+        row["x_"+str(i)] = x
+
+    for name,value in zip(criterion_names,crt):
+        row["crt."+name] = value
+
+    for i,value in enumerate(cst):
+        row["cst_"+str(i)] = value
+
+    row["feasible"] = float(np.all(np.asarray(cst)>=0.))
+
+    for path in outputs:
+        row[path] = get_attribute(ac,path)
+
+    return row
+
+
+#===========================================================================================================
+def eval_optim_all(x_in,ac,database=None):
+    """
+    Compute all criteria and constraints
+    If given, database is a DesignDatabase where each evaluation is recorded, see optim_record
+    """
+
+    set_design_vector(x_in,ac)
+
+    # Run MDA
+    #------------------------------------------------------------------------------------------------------
+
+    eval_mda2(ac)
+
+    crt,cst = get_optim_data(ac)
+
+    if (database is not None):
+        database.append(optim_record(x_in,crt,cst,ac))
+
+    return crt,cst
+
+
+#===========================================================================================================
+def eval_optim_data(x_in,ac,crit_index,crit_ref,cache=None):
+    """
+    Compute criterion and constraints
+    If given, cache is an EvalCache of eval_optim_all so that each design vector is solved only once
+    """
+
+    if (cache is None):
+        crt,cst = eval_optim_all(x_in,ac)
+    else:
+        crt,cst = cache(x_in)
+
     crit = crt[crit_index] * (20./crit_ref)
 
-    return crit,cst
+    return crit,cst.copy()
+
+
+#===========================================================================================================
+def eval_design(aircraft,x_in,process=None):
+    """
+    Evaluate a design vector without modifying the given aircraft
+    The MDA runs on a private copy, so one base aircraft can serve concurrent evaluations
+    Returns all criteria, all constraints and the evaluated copy as result snapshot
+    """
+
+    if (process is None):
+        process = eval_mda2
+
+    ac = copy.deepcopy(aircraft)
+
+    set_design_vector(x_in,ac)
+
+    process(ac)
+
+    crt,cst = get_optim_data(ac)
+
+    return crt,cst,ac
+
+
+#===========================================================================================================
+def eval_design_data(x_in,aircraft):
+    """
+    Criteria and constraints of a design vector evaluated on a copy of the aircraft, for worker pools
+    """
+
+    crt,cst,ac = eval_design(aircraft,x_in)
+
+    return crt,cst
 
 
 #===========================================================================================================
-def eval_optim_cst(x_in,aircraft,crit_index,crit_ref):
+def eval_optim_cst(x_in,aircraft,crit_index,crit_ref,cache=None):
     """
     Retrieve constraints
     """
 
-    crit,cst = eval_optim_data(x_in,aircraft,crit_index,crit_ref)
+    crit,cst = eval_optim_data(x_in,aircraft,crit_index,crit_ref,cache)
 
     print("cst :",cst)
 
@@ -738,12 +1007,12 @@ def eval_optim_cst(x_in,aircraft,crit_index,crit_ref):
 
 
 #===========================================================================================================
-def eval_optim_crt(x_in,aircraft,crit_index,crit_ref):
+def eval_optim_crt(x_in,aircraft,crit_index,crit_ref,cache=None):
     """
     Retreve criteria
     """
 
-    crit,cst = eval_optim_data(x_in,aircraft,crit_index,crit_ref)
+    crit,cst = eval_optim_data(x_in,aircraft,crit_index,crit_ref,cache)
 
     print("Design :",x_in)
     print("Crit :",crit)
@@ -752,45 +1021,46 @@ def eval_optim_crt(x_in,aircraft,crit_index,crit_ref):
 
 
 #===========================================================================================================
-def mdf_process(aircraft,search_domain,criterion):
+def mdf_process(aircraft,search_domain,criterion,cache_size=256,x_tol=None,jac_workers=None,database=None):
     """
     Compute criterion and constraints
+    MDA results are cached so that criterion and constraints of a given design are computed once,
+    x_tol is the optional rounding step of the cache key
+    If jac_workers is given, finite difference Jacobians are computed by that number of worker processes
+    If database is given, every MDA of the optimization is recorded in this DesignDatabase,
+    evaluations made by Jacobian workers are not recorded
+    The aircraft is evaluated at the optimum before returning, cache hits leave it in the state of the last miss
     """
 
-    if (aircraft.propulsion.architecture==1):
-        start_value = (aircraft.turbofan_engine.reference_thrust,aircraft.wing.area)
-    elif (aircraft.propulsion.architecture==2):
-        start_value = (aircraft.turbofan_engine.reference_thrust,aircraft.wing.area)
-    elif (aircraft.propulsion.architecture==3):
-        start_value = (aircraft.turbofan_engine.reference_thrust,aircraft.wing.area)
-    elif (aircraft.propulsion.architecture==4):
-        start_value = (aircraft.turboprop_engine.reference_thrust,aircraft.wing.area)
-    else:
-        raise Exception("propulsion.architecture index is out of range")
+    start_value = get_design_vector(aircraft)
 
-
-    if (criterion=="MTOW"):
-        crit_index = 0
-    elif (criterion=="block_fuel"):
-        crit_index = 1
-    elif (criterion=="CO2_metric"):
-        crit_index = 2
-    elif (criterion=="COC"):
-        crit_index = 3
-    elif (criterion=="DOC"):
-        crit_index = 4
-    else:
-        raise Exception("Criterion name is unknown")
+    crit_index = criterion_index(criterion)
 
     eval_mda0(aircraft)     # Initialization (compulsory only with mda3)
 
-    crit_ref,cst_ref = eval_optim_data(start_value,aircraft,crit_index,1.)
+    cache = EvalCache(fct=lambda x:eval_optim_all(x,aircraft,database), max_size=cache_size, x_tol=x_tol)
 
-    res = minimize(eval_optim_crt, start_value, args=(aircraft,crit_index,crit_ref,), method="trust-constr",
-                   jac="3-point", hess=SR1(), hessp=None, bounds=search_domain, tol=1e-5,
-                   constraints=NonlinearConstraint(fun=lambda x:eval_optim_cst(x,aircraft,crit_index,crit_ref),
-                                                   lb=0., ub=np.inf, jac='3-point'),
-                   options={'maxiter':500,'gtol': 1e-13})
+    crit_ref,cst_ref = eval_optim_data(start_value,aircraft,crit_index,1.,cache)
+
+    if (jac_workers is None):
+        crt_jac = "3-point"
+        cst_jac = "3-point"
+    else:
+        jac_provider = FdJacobian(fct=eval_design_data, args=(aircraft,), n_workers=jac_workers)
+        crt_jac = lambda x,*args:jac_provider(x)[0][crit_index]*(20./crit_ref)
+        cst_jac = lambda x:jac_provider(x)[1]
+
+    try:
+        res = minimize(eval_optim_crt, start_value, args=(aircraft,crit_index,crit_ref,cache,), method="trust-constr",
+                       jac=crt_jac, hess=SR1(), hessp=None, bounds=search_domain, tol=1e-5,
+                       constraints=NonlinearConstraint(fun=lambda x:eval_optim_cst(x,aircraft,crit_index,crit_ref,cache),
+                                                       lb=0., ub=np.inf, jac=cst_jac),
+                       options={'maxiter':500,'gtol': 1e-13})
+    finally:
+        if (jac_workers is not None):
+            jac_provider.close()
+        if (database is not None):
+            database.flush()
     #              tol=None, callback=None,
     #              options={'grad': None, 'xtol': 1e-08, 'gtol': 1e-08, 'barrier_tol': 1e-08,
     #                       'sparse_jacobian': None, 'maxiter': 1000, 'verbose': 0,
@@ -805,6 +1075,137 @@ def mdf_process(aircraft,search_domain,criterion):
     #res = minimize(eval_optim_crt, x_in, args=(aircraft,crit_index,crit_ref,), method="COBYLA", bounds=((110000,140000),(120,160)),
     #               constraints={"type":"ineq","fun":eval_optim_cst,"args":(aircraft,crit_index,crit_ref,)},
     #               options={"maxiter":100,"tol":0.1,"catol":0.0002,'rhobeg': 1.0})
+
+    eval_optim_all(res.x,aircraft)      # Aircraft data of the optimal design, not recorded twice in database
+
+    res.cache_hit = cache.n_hit
+    res.cache_miss = cache.n_miss
+
+    print(res)
+
+    return res
+
+
+#===========================================================================================================
+def mdf_surrogate_process(aircraft,search_domain,criterion,n_sample=8,n_workers=None,max_iter=50,x_tol=1.e-4):
+    """
+    Surrogate assisted MDF : the optimization runs on a RBF response surface of criterion and constraints
+    The surface is fitted on a space filling design evaluated in parallel, then refitted in a trust region
+    around the current design, each candidate design is verified by one single MDA
+    x_tol is the stopping trust region size relative to search domain
+    """
+
+    crit_index = criterion_index(criterion)
+
+    eval_mda0(aircraft)     # Initialization
+
+    lower = np.array([b[0] for b in search_domain], dtype=float)
+    upper = np.array([b[1] for b in search_domain], dtype=float)
+    width = upper - lower
+
+    penalty = 100.      # Weight of constraint violation in merit function
+
+    x_data = []
+    y_data = []
+
+    if (n_workers is None or 1<n_workers):
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(max_workers=n_workers)
+    else:
+        pool = None
+
+    #===========================================================================================================
+    def evaluate(x_list):
+        if (pool is None):
+            res_list = [eval_design_data(x,aircraft) for x in x_list]
+        else:
+            res_list = list(pool.map(eval_design_data, x_list, [aircraft]*len(x_list)))
+        for x,(crt,cst) in zip(x_list,res_list):
+            x_data.append(np.array(x, dtype=float))
+            y_data.append(np.concatenate(([crt[crit_index]],cst)))
+        return [y_data[k] for k in range(len(y_data)-len(x_list),len(y_data))]
+
+    def merit(y):
+        return y[0]*(20./crit_ref) + penalty*np.sum(np.maximum(0.,-y[1:]))
+    #-----------------------------------------------------------------------------------------------------------
+
+    try:
+        x_c = np.clip(np.array(get_design_vector(aircraft), dtype=float), lower, upper)
+        delta = 0.1*width       # Trust region half width
+
+        box_l = np.maximum(lower,x_c-delta)
+        box_u = np.minimum(upper,x_c+delta)
+
+        y_c = evaluate([x_c] + list(latin_hypercube(box_l,box_u,n_sample,seed=0)))[0]
+
+        crit_ref = y_c[0]*20.
+
+        message = "Maximum number of iterations is reached"
+        success = False
+        nit = 0
+
+        for nit in range(1,max_iter+1):
+
+            box_l = np.maximum(lower,x_c-delta)
+            box_u = np.minimum(upper,x_c+delta)
+
+            # Local samples, infill if they are too few to fit the surface
+            local = [k for k,x in enumerate(x_data) if np.all(np.abs(x-x_c)<=2.*delta)]
+            if (len(local)<len(x_c)+3):
+                evaluate(list(latin_hypercube(box_l,box_u,len(x_c)+3-len(local),seed=nit)))
+                local = [k for k,x in enumerate(x_data) if np.all(np.abs(x-x_c)<=2.*delta)]
+
+            surrogate = RbfSurrogate(x_scale=width)
+            surrogate.fit([x_data[k] for k in local],[y_data[k] for k in local])
+
+            # Sub problem is solved in normalized variables
+            res = minimize(lambda u:surrogate(lower+u*width)[0]*(20./crit_ref), (x_c-lower)/width, method="SLSQP",
+                           bounds=list(zip((box_l-lower)/width,(box_u-lower)/width)),
+                           constraints={"type":"ineq","fun":lambda u:surrogate(lower+u*width)[1:]})
+
+            x_new = np.clip(lower+res.x*width, box_l, box_u)
+            step = np.max(np.abs(x_new-x_c)/width)
+
+            if (step<x_tol):
+                message = "Surrogate optimum is reached"
+                success = True
+                break
+
+            y_new = evaluate([x_new])[0]
+
+            # Trust ratio between actual and predicted merit reductions
+            predicted = merit(y_c) - merit(surrogate(x_new))
+            actual = merit(y_c) - merit(y_new)
+            if (0.<predicted):
+                rho = actual/predicted
+            else:
+                rho = 1. if (0.<actual) else -1.
+
+            if (0.1<rho):
+                x_c = x_new
+                y_c = y_new
+
+            if (rho<0.25):
+                delta = 0.5*delta
+            elif (0.75<rho and x_tol<step and np.any(np.isclose(x_new,box_l) | np.isclose(x_new,box_u))):
+                delta = np.minimum(2.*delta,width)
+
+            if (np.max(delta/width)<x_tol):
+                message = "Trust region size is below x_tol"
+                success = True
+                break
+
+    finally:
+        if (pool is not None):
+            pool.shutdown()
+
+    # Leave the aircraft at the optimum
+    set_design_vector(x_c,aircraft)
+    eval_mda2(aircraft)
+
+    res = OptimizeResult(x=x_c, fun=y_c[0]*(20./crit_ref), constr=y_c[1:], success=success and np.all(-1e-6<=y_c[1:]),
+                         message=message, nit=nit, nfev=len(x_data))
+
     print(res)
 
     return res
@@ -9,7 +9,7 @@ Created on Thu Jan 24 23:22:21 2019
 Changed name from "solvers.py" to "component.py" on 21:05:2019
 """
 
-
+import numpy
 from scipy.optimize import fsolve
 
 from marilib.aircraft_model.operations import mission as perfo, \
@@ -72,6 +72,23 @@ def mission_payload(aircraft,tow,range,altp,mach,disa):
 def mission_tow(aircraft,payload,range,altp,mach,disa):
     """
     Mission simulation (take off weight is output)
+    Breguet model is inverted in closed form, the iterative resolution is kept as fallback
+    """
+
+    tow = perfo.breguet_tow(aircraft,payload,range,altp,mach,disa)
+
+    if numpy.isnan(tow):
+        return mission_tow_fsolve(aircraft,payload,range,altp,mach,disa)
+
+    [block_fuel,block_time,total_fuel] = perfo.mission(aircraft,range,tow,altp,mach,disa)
+
+    return tow,block_fuel,block_time,total_fuel
+
+
+#===========================================================================================================
+def mission_tow_fsolve(aircraft,payload,range,altp,mach,disa):
+    """
+    Mission simulation (take off weight is output), iterative resolution
     """
 
     weights = aircraft.weights
@@ -101,6 +118,25 @@ def mission_tow(aircraft,payload,range,altp,mach,disa):
 def mission_range(aircraft,tow,payload,altp,mach,disa):
     """
     Mission simulation (range is output)
+    Breguet model is inverted in closed form, the iterative resolution is kept as fallback
+    """
+
+    weights = aircraft.weights
+
+    range = perfo.breguet_range(aircraft,tow,tow-weights.owe-payload,altp,mach,disa)
+
+    if numpy.isnan(range):
+        return mission_range_fsolve(aircraft,tow,payload,altp,mach,disa)
+
+    [block_fuel,block_time,total_fuel] = perfo.mission(aircraft,range,tow,altp,mach,disa)
+
+    return range,block_fuel,block_time,total_fuel
+
+
+#===========================================================================================================
+def mission_range_fsolve(aircraft,tow,payload,altp,mach,disa):
+    """
+    Mission simulation (range is output), iterative resolution
     """
 
     design_driver = aircraft.design_driver
@@ -130,6 +166,27 @@ def mission_range(aircraft,tow,payload,altp,mach,disa):
 def mission_fuel_limited(aircraft,tow,total_fuel,altp,mach,disa):
     """
     Mission fuel limited (range & payload are output)
+    Breguet model is inverted in closed form, the iterative resolution is kept as fallback
+    """
+
+    weights = aircraft.weights
+
+    range = perfo.breguet_range(aircraft,tow,total_fuel,altp,mach,disa)
+
+    if numpy.isnan(range):
+        return mission_fuel_limited_fsolve(aircraft,tow,total_fuel,altp,mach,disa)
+
+    block_fuel,block_time,total_fuel = perfo.mission(aircraft,range,tow,altp,mach,disa)
+
+    payload = tow - weights.owe - total_fuel
+
+    return range,payload,block_fuel,block_time
+
+
+#===========================================================================================================
+def mission_fuel_limited_fsolve(aircraft,tow,total_fuel,altp,mach,disa):
+    """
+    Mission fuel limited (range & payload are output), iterative resolution
     """
 
     design_driver = aircraft.design_driver
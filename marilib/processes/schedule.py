@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jan 24 23:22:21 2019
+
+@author: DRUOT Thierry
+
+Evaluation of one design over an airline schedule
+"""
+
+import numpy
+
+from marilib.tools import units as unit
+
+from marilib.aircraft_model.operations import mission as perfo, \
+                                              pricing_and_costing as costing
+
+
+# Sector table columns : name, unit, default value (None means compulsory)
+#    range : NM, sector length
+#    payload : kg, sector payload
+#    disa : degK, temperature shift
+#    altp : ft, cruise pressure altitude, default is aircraft reference cruise altitude
+#    mach : no_dim, cruise Mach number, default is aircraft cruise Mach
+#    n_flight : no_dim, number of flights of the sector in the schedule
+sector_columns = (("range",None),
+                  ("payload",None),
+                  ("disa",0.),
+                  ("altp",None),
+                  ("mach",None),
+                  ("n_flight",1.))
+
+
+#===========================================================================================================
+def read_schedule(file_path):
+    """
+    Read a sector table from a CSV file with a header line naming the columns, see sector_columns
+    """
+
+    sectors = numpy.genfromtxt(file_path, delimiter=",", names=True, dtype=float, encoding="utf-8")
+
+    return numpy.atleast_1d(sectors)
+
+
+#===========================================================================================================
+def sector_data(aircraft,sectors):
+    """
+    Sector table as a dictionary of float arrays in SI units, missing optional columns are set to default
+    """
+
+    names = sectors.dtype.names
+    n = len(sectors)
+
+    data = {}
+
+    for name,default in sector_columns:
+        if name in names:
+            data[name] = numpy.asarray(sectors[name], dtype=float)
+        elif (name=="altp"):
+            data[name] = None
+        elif (name=="mach"):
+            data[name] = numpy.full(n,aircraft.design_driver.cruise_mach)
+        elif (default is None):
+            raise Exception("sector_data, compulsory column is missing : "+name)
+        else:
+            data[name] = numpy.full(n,default)
+
+    data["range"] = unit.m_NM(data["range"])
+
+    if (data["altp"] is None):
+        data["altp"] = numpy.full(n,aircraft.design_driver.ref_cruise_altp)
+    else:
+        data["altp"] = unit.m_ft(data["altp"])
+
+    return data
+
+
+#===========================================================================================================
+def eval_schedule(aircraft,sectors):
+    """
+    Take off weight, fuel, CO2 and operating costs of every sector of a schedule
+    sectors : NumPy structured array or CSV file path, see sector_columns
+    Sectors are grouped by flight condition and solved in closed form, one batch per group
+    Returns a structured array of sector results and a dictionary of schedule totals weighted by n_flight,
+    totals only count feasible sectors, the demand of unfeasible sectors (including those without solution,
+    which have NaN results) is given by n_unfeasible, unfeasible_distance and unfeasible_payload_distance
+    """
+
+    if isinstance(sectors,str):
+        sectors = read_schedule(sectors)
+
+    data = sector_data(aircraft,sectors)
+
+    n = len(sectors)
+
+    tow = numpy.zeros(n)
+    block_fuel = numpy.zeros(n)
+    block_time = numpy.zeros(n)
+    total_fuel = numpy.zeros(n)
+
+    conditions = numpy.stack((data["altp"],data["mach"],data["disa"]), axis=1)
+
+    unique_conditions,inverse = numpy.unique(conditions, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+
+    for j,(altp,mach,disa) in enumerate(unique_conditions):
+        group = (inverse==j)
+
+        tow_j = perfo.breguet_tow(aircraft,data["payload"][group],data["range"][group],altp,mach,disa)
+
+        tow[group] = tow_j
+        block_fuel[group],block_time[group],total_fuel[group] = perfo.mission(aircraft,data["range"][group],tow_j,altp,mach,disa)
+
+    weights = aircraft.weights
+
+    feasible = (tow<=weights.mtow) & (total_fuel<=weights.mfw) & (data["payload"]<=aircraft.payload.maximum)
+
+    cost = costing.operating_costs(aircraft,block_fuel,block_time,data["range"])
+
+    result = numpy.zeros(n, dtype=[("tow",float),("block_fuel",float),("block_time",float),("total_fuel",float),
+                                   ("block_CO2",float),("cash_op_cost",float),("direct_op_cost",float),
+                                   ("feasible",bool)])
+
+    result["tow"] = tow
+    result["block_fuel"] = block_fuel
+    result["block_time"] = block_time
+    result["total_fuel"] = total_fuel
+    result["block_CO2"] = block_fuel * aircraft.environmental_impact.CO2_index
+    result["cash_op_cost"] = cost["cash_op_cost"]
+    result["direct_op_cost"] = cost["direct_op_cost"]
+    result["feasible"] = feasible
+
+    # Totals only count feasible sectors, unfeasible sectors are reported as unserved demand
+    #-----------------------------------------------------------------------------------------------------------
+    n_flight = data["n_flight"]
+
+    served = numpy.where(feasible, n_flight, 0.)
+    unserved = numpy.where(feasible, 0., n_flight)
+
+    def feasible_sum(value):
+        return numpy.sum(served*numpy.where(feasible, value, 0.))
+
+    total = {"n_flight":numpy.sum(served),
+             "n_unfeasible":numpy.sum(unserved),
+             "distance":feasible_sum(data["range"]),
+             "payload_distance":feasible_sum(data["payload"]*data["range"]),
+             "block_fuel":feasible_sum(result["block_fuel"]),
+             "block_time":feasible_sum(result["block_time"]),
+             "block_CO2":feasible_sum(result["block_CO2"]),
+             "cash_op_cost":feasible_sum(result["cash_op_cost"]),
+             "direct_op_cost":feasible_sum(result["direct_op_cost"]),
+             "unfeasible_distance":numpy.sum(unserved*data["range"]),
+             "unfeasible_payload_distance":numpy.sum(unserved*data["payload"]*data["range"])}
+
+    return result,total
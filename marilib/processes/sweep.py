@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jan 24 23:22:21 2019
+
+@author: DRUOT Thierry
+
+Design space sweeps : run an MDA process on many variants of a base aircraft
+"""
+
+import os
+import copy
+import time
+import itertools
+import traceback
+
+import numpy
+
+from collections import namedtuple
+
+
+# One sweep result
+#    index : position of the point in the sweep
+#    overrides : dictionary {dotted attribute path : value} applied to the base aircraft
+#    success : False if the process raised an exception or reported a convergence failure
+#    message : error message or optimizer message
+#    outputs : dictionary {dotted attribute path : value} read on the aircraft after the process
+#    time : wall time of the evaluation (s)
+#    aircraft : evaluated aircraft if requested, None otherwise
+SweepRecord = namedtuple("SweepRecord", ["index","overrides","success","message","outputs","time","aircraft"])
+
+
+# Default outputs read on each evaluated aircraft
+default_outputs = ("turbofan_engine.reference_thrust",
+                   "wing.area",
+                   "weights.mtow",
+                   "weights.owe",
+                   "cost_mission.block_fuel",
+                   "economics.cash_operating_cost",
+                   "economics.direct_operating_cost",
+                   "environmental_impact.CO2_metric")
+
+
+#===========================================================================================================
+def get_attribute(aircraft,path):
+    """
+    Read an aircraft data given by its dotted path, for instance "power_elec_chain.mto"
+    """
+
+    obj = aircraft
+    for name in path.split("."):
+        obj = getattr(obj,name)
+
+    return obj
+
+
+#===========================================================================================================
+def set_attribute(aircraft,path,value):
+    """
+    Write an aircraft data given by its dotted path, for instance "power_elec_chain.mto"
+    """
+
+    names = path.split(".")
+
+    obj = aircraft
+    for name in names[:-1]:
+        obj = getattr(obj,name)
+
+    if not hasattr(obj,names[-1]):
+        raise Exception("set_attribute, unknown aircraft data : "+path)
+
+    setattr(obj,names[-1],value)
+
+    return
+
+
+#===========================================================================================================
+def sweep_grid(axes):
+    """
+    Full factorial list of overrides
+    axes : dictionary {dotted attribute path : list of values}, or list of (path, values) pairs
+    Several paths can be driven together by giving a tuple of paths and a list of value tuples
+    """
+
+    if isinstance(axes,dict):
+        axes = list(axes.items())
+
+    paths = [path for path,values in axes]
+    values = [values for path,values in axes]
+
+    points = []
+
+    for combination in itertools.product(*values):
+        overrides = {}
+        for path,value in zip(paths,combination):
+            if isinstance(path,tuple):
+                for sub_path,sub_value in zip(path,value):
+                    overrides[sub_path] = sub_value
+            else:
+                overrides[path] = value
+        points.append(overrides)
+
+    return points
+
+
+#===========================================================================================================
+def eval_sweep_point(index,aircraft,overrides,process,process_args,outputs,keep_aircraft):
+    """
+    Evaluate one sweep point on a private copy of the base aircraft
+    Exceptions are caught and reported in the record, the point also fails if the process returns an unsuccessful
+    optimization result or if one of the MDA coupling solves does not converge
+    """
+
+    from marilib.processes import assembly     # Not imported at module level, assembly imports sweep
+
+    t0 = time.time()
+
+    ac = copy.deepcopy(aircraft)
+
+    try:
+        for path,value in overrides.items():
+            set_attribute(ac,path,value)
+
+        failures = dict(assembly.coupling_failures)
+
+        res = process(ac,*process_args)
+
+        success = bool(getattr(res,"success",True))
+        message = str(getattr(res,"message",""))
+
+        unconverged = [name for name,n in assembly.coupling_failures.items() if failures.get(name,0)<n]
+        if (0<len(unconverged)):
+            success = False
+            message = "Coupling solve did not converge : "+", ".join(unconverged)
+
+        values = {}
+        for path in outputs:
+            values[path] = get_attribute(ac,path)
+
+    except Exception as error:
+        success = False
+        message = "".join(traceback.format_exception_only(type(error),error)).strip()
+        values = {}
+
+    if not keep_aircraft:
+        ac = None
+
+    return SweepRecord(index,overrides,success,message,values,time.time()-t0,ac)
+
+
+#===========================================================================================================
+def sweep_columns(points,outputs=default_outputs):
+    """
+    Database columns of a sweep : index, success, time, overridden data and outputs
+    """
+
+    columns = ["index","success","time"]
+
+    for overrides in points:
+        for path in overrides:
+            if path not in columns:
+                columns.append(path)
+
+    for path in outputs:
+        if path not in columns:
+            columns.append(path)
+
+    return columns
+
+
+#===========================================================================================================
+def sweep_row(record,outputs=default_outputs):
+    """
+    Database row of a sweep record, non numerical values and outputs of failed points are set to NaN
+    """
+
+    row = {"index":record.index, "success":float(record.success), "time":record.time}
+
+    for path,value in list(record.overrides.items()) + [(path,record.outputs.get(path)) for path in outputs]:
+        try:
+            row[path] = float(value)
+        except (TypeError,ValueError):
+            row[path] = numpy.nan
+
+    return row
+
+
+#===========================================================================================================
+def run_sweep(aircraft,points,process,process_args=(),outputs=default_outputs,n_workers=None,keep_aircraft=False,
+              database=None):
+    """
+    Run a process on every sweep point, records are yielded in completion order
+    aircraft : base aircraft, never modified
+    points : list of overrides dictionaries, see sweep_grid
+    process : eval_mda0, eval_mda1, eval_mda2, eval_mda3, mdf_process or any function(aircraft,*process_args)
+    n_workers : number of worker processes, default is the number of cores, 1 runs in the current process
+    database : optional DesignDatabase where every record is appended, see sweep_row
+    """
+
+    if (n_workers is None):
+        n_workers = os.cpu_count()
+
+    if (database is not None and database.columns is None):
+        database.define(sweep_columns(points,outputs))
+
+    try:
+        if (n_workers<=1):
+            for index,overrides in enumerate(points):
+                record = eval_sweep_point(index,aircraft,overrides,process,process_args,outputs,keep_aircraft)
+                if (database is not None):
+                    database.append(sweep_row(record,outputs))
+                yield record
+            return
+
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+
+            futures = {pool.submit(eval_sweep_point,index,aircraft,overrides,process,process_args,outputs,keep_aircraft):index
+                       for index,overrides in enumerate(points)}
+
+            for future in as_completed(futures):
+                try:
+                    record = future.result()
+                except Exception as error:     # The worker died, for instance BrokenProcessPool
+                    index = futures[future]
+                    message = "".join(traceback.format_exception_only(type(error),error)).strip()
+                    record = SweepRecord(index,points[index],False,message,{},0.,None)
+                if (database is not None):
+                    database.append(sweep_row(record,outputs))
+                yield record
+
+    finally:
+        if (database is not None):
+            database.flush()
+
+    return
+
+
+#===========================================================================================================
+def sweep(aircraft,points,process,process_args=(),outputs=default_outputs,n_workers=None,keep_aircraft=False,
+          database=None):
+    """
+    Run a process on every sweep point and return the records sorted by point index
+    """
+
+    records = list(run_sweep(aircraft,points,process,process_args,outputs,n_workers,keep_aircraft,database))
+
+    records.sort(key=lambda record: record.index)
+
+    return records
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jan 24 23:22:21 2019
+
+@author: DRUOT Thierry
+
+Micro benchmarks of MARILib hot paths on the reference 150 pax aircraft of the examples
+Only the turbofan architecture is benchmarked, the MDA of the partial turboelectric architecture does not
+converge in this version so that none of its hot paths can be set up
+Results are written as JSON and compared to a stored baseline, a case is flagged as a regression
+when its best time per call exceeds the baseline by more than the tolerance
+The default baseline is benchmark_baseline.json, next to this module, measured on the reference machine given in it
+Usage : python -m marilib.tools.benchmark [--case name ...] [--output file] [--baseline file | --no-baseline]
+                                          [--tolerance ratio]
+"""
+
+import io
+import os
+import sys
+import copy
+import json
+import time
+import platform
+import argparse
+import contextlib
+
+import numpy
+
+from marilib.tools import units as unit
+
+from marilib.aircraft_data.aircraft_description import Aircraft
+
+from marilib.earth import environment as earth
+
+from marilib.aircraft_model.airplane import aerodynamics as craft_aero
+
+from marilib.airplane.propulsion import propulsion_models as propu
+
+from marilib.aircraft_model.operations import mission as perfo
+
+from marilib.aircraft_model.operations import qs_mission as qs
+
+from marilib.processes import assembly as run
+
+
+# Format of the result files
+result_version = 1
+
+# Stored reference results
+default_baseline = os.path.join(os.path.dirname(os.path.abspath(__file__)),"benchmark_baseline.json")
+
+
+#===========================================================================================================
+def reference_aircraft(propulsive_architecture=1):
+    """
+    150 pax, 3000 NM, Mach 0.78 aircraft of the examples, 1:turbofan, 2:partial turboelectric
+    Returned before any MDA
+    """
+
+    aircraft = Aircraft(propulsive_architecture)
+
+    run.aircraft_initialize(aircraft, 150, unit.m_NM(3000), 0.78, propulsive_architecture, 2)
+
+    if (propulsive_architecture==1):
+        aircraft.turbofan_engine.reference_thrust = 119000.
+        aircraft.wing.area = 151.9
+    else:
+        aircraft.turbofan_engine.reference_thrust = 118482.
+        aircraft.wing.area = 152.9
+        e_power = 1.0e6
+        aircraft.power_elec_chain.mto = e_power
+        aircraft.power_elec_chain.mcn = e_power
+        aircraft.power_elec_chain.mcl = e_power
+        aircraft.power_elec_chain.mcr = e_power
+
+    return aircraft
+
+
+#===========================================================================================================
+def evaluated_aircraft(propulsive_architecture=1):
+    """
+    Reference aircraft after a full MDA
+    """
+
+    aircraft = reference_aircraft(propulsive_architecture)
+
+    run.eval_mda0(aircraft)
+    run.eval_mda3(aircraft)
+
+    return aircraft
+
+
+#===========================================================================================================
+def benchmark_cases():
+    """
+    List of (name, setup) couples, setup builds the data of the case and returns the function to be timed
+    """
+
+    def cruise(aircraft):
+        pamb,tamb,tstd,dtodz = earth.atmosphere(aircraft.design_driver.ref_cruise_altp,0.)
+        return pamb,tamb,aircraft.design_driver.cruise_mach
+
+    def case_atmosphere():
+        return lambda: earth.atmosphere(10668.,0.)
+
+    def uncached(fct):
+        def timed():
+            craft_aero.polar_cache.clear()
+            return fct()
+        return timed
+
+    def cold_start():
+        # Processes are timed without drag polars nor coupling solutions left by previous calls
+        craft_aero.polar_cache.clear()
+        run.coupling_store.clear()
+
+    def case_drag(cached):
+        def setup():
+            aircraft = evaluated_aircraft()
+            pamb,tamb,mach = cruise(aircraft)
+            cz = aircraft.aerodynamics.cz_cruise_lod_max
+            fct = lambda: craft_aero.drag(aircraft,pamb,tamb,mach,cz)
+            return fct if cached else uncached(fct)
+        return setup
+
+    def case_lod_max(cached):
+        def setup():
+            aircraft = evaluated_aircraft()
+            pamb,tamb,mach = cruise(aircraft)
+            fct = lambda: craft_aero.lod_max(aircraft,pamb,tamb,mach)
+            return fct if cached else uncached(fct)
+        return setup
+
+    def case_thrust(propulsive_architecture):
+        def setup():
+            aircraft = evaluated_aircraft(propulsive_architecture)
+            pamb,tamb,mach = cruise(aircraft)
+            rating = aircraft.propulsion.rating_code[2]
+            return lambda: propu.thrust(aircraft,pamb,tamb,mach,rating,0)
+        return setup
+
+    def case_sfc(propulsive_architecture):
+        def setup():
+            aircraft = evaluated_aircraft(propulsive_architecture)
+            pamb,tamb,mach = cruise(aircraft)
+            rating = aircraft.propulsion.rating_code[3]
+            return lambda: propu.sfc(aircraft,pamb,tamb,mach,rating,0)
+        return setup
+
+    def case_mission():
+        aircraft = evaluated_aircraft()
+        altp = aircraft.design_driver.ref_cruise_altp
+        mach = aircraft.design_driver.cruise_mach
+        dist_range = aircraft.design_driver.design_range
+        tow = aircraft.weights.mtow
+        return lambda: perfo.mission(aircraft,dist_range,tow,altp,mach,0.)
+
+    def case_time_to_climb():
+        aircraft = evaluated_aircraft()
+        toc = aircraft.high_speed.req_toc_altp
+        disa = 0.
+        mass = aircraft.weights.mtow
+        vcas1 = aircraft.high_speed.cas1_ttc
+        vcas2 = aircraft.high_speed.cas2_ttc
+        mach = aircraft.design_driver.cruise_mach
+        return lambda: perfo.time_to_climb(aircraft,toc,disa,mass,vcas1,vcas2,mach)
+
+    def case_qs_mission():
+        aircraft = evaluated_aircraft()
+        disa = 0.
+        tow = aircraft.weights.mtow
+        dist_range = unit.m_NM(1000)
+        altp0 = unit.m_ft(1500)
+        altp1 = unit.m_ft(10000)
+        vcas1 = unit.mps_kt(250)
+        vcas2 = unit.mps_kt(300)
+        altp2 = aircraft.design_driver.ref_cruise_altp
+        mach = aircraft.design_driver.cruise_mach
+        vz_mcr_min = unit.mps_ftpmin(0)
+        vz_mcl_min = unit.mps_ftpmin(300)
+        return lambda: qs.qs_mission(aircraft,disa,tow,dist_range,"East",altp0,vcas1,altp1,vcas2,altp2,mach,
+                                     vcas2,altp1,vcas1,altp0,vz_mcr_min,vz_mcl_min)
+
+    def case_take_off_field_length():
+        aircraft = evaluated_aircraft()
+        altp = aircraft.low_speed.altp_tofl
+        disa = aircraft.low_speed.disa_tofl
+        mass = aircraft.weights.mtow
+        hld_conf = aircraft.aerodynamics.hld_conf_to
+        return lambda: perfo.take_off_field_length(aircraft,altp,disa,mass,hld_conf)
+
+    def case_process(process,n_mda0=0):
+        def setup():
+            aircraft = reference_aircraft()
+            if (0<n_mda0):
+                run.eval_mda0(aircraft)
+            def fct():
+                cold_start()
+                ac = copy.deepcopy(aircraft)
+                process(ac)
+            return fct
+        return setup
+
+    def case_mass_breakdown():
+        aircraft = evaluated_aircraft()
+        return lambda: run.eval_mass_breakdown(aircraft)
+
+    def case_mdf_process():
+        aircraft = reference_aircraft()
+        search_domain = ((110000,140000),(120,160))
+        def fct():
+            cold_start()
+            ac = copy.deepcopy(aircraft)
+            with contextlib.redirect_stdout(io.StringIO()):
+                run.mdf_process(ac,search_domain,"block_fuel")
+        return fct
+
+    return [("earth.atmosphere", case_atmosphere),
+            ("aerodynamics.drag", case_drag(False)),
+            ("aerodynamics.drag.cached", case_drag(True)),
+            ("aerodynamics.lod_max", case_lod_max(False)),
+            ("aerodynamics.lod_max.cached", case_lod_max(True)),
+            ("propulsion_models.thrust.turbofan", case_thrust(1)),
+            ("propulsion_models.sfc.turbofan", case_sfc(1)),
+            ("mission.mission", case_mission),
+            ("mission.time_to_climb", case_time_to_climb),
+            ("mission.take_off_field_length", case_take_off_field_length),
+            ("qs_mission.qs_mission", case_qs_mission),
+            ("assembly.eval_mass_breakdown", case_mass_breakdown),
+            ("assembly.eval_mda0", case_process(run.eval_mda0)),
+            ("assembly.eval_mda1", case_process(run.eval_mda1)),
+            ("assembly.eval_mda2", case_process(run.eval_mda2)),
+            ("assembly.eval_mda3", case_process(run.eval_mda3,n_mda0=1)),
+            ("assembly.mdf_process", case_mdf_process)]
+
+
+#===========================================================================================================
+def time_function(fct,n_repeat=5,min_time=0.05,max_time=10.):
+    """
+    Time per call of a function without argument
+    Calls are grouped in loops lasting at least min_time, n_repeat loops are timed, fewer if max_time is exceeded
+    """
+
+    # Calibration, the number of calls per loop grows until one loop lasts min_time
+    n_loop = 1
+    while True:
+        t0 = time.perf_counter()
+        for i in range(n_loop):
+            fct()
+        dt = time.perf_counter() - t0
+        if (min_time<=dt):
+            break
+        n_loop *= max(2,min(10,int(min_time/max(dt,1.e-9))+1))
+
+    times = [dt/n_loop]
+    t_start = time.perf_counter()
+    while (len(times)<n_repeat and time.perf_counter()-t_start+dt<max_time):
+        t0 = time.perf_counter()
+        for i in range(n_loop):
+            fct()
+        times.append((time.perf_counter()-t0)/n_loop)
+
+    return {"best":min(times), "median":float(numpy.median(times)), "n_loop":n_loop, "n_repeat":len(times)}
+
+
+#===========================================================================================================
+def run_benchmarks(names=None,n_repeat=5,min_time=0.05,max_time=10.,verbose=False):
+    """
+    Run benchmark cases, all cases if names is None
+    Cases raising an exception are reported with their error message
+    """
+
+    results = {}
+
+    for name,setup in benchmark_cases():
+        if (names is not None and name not in names):
+            continue
+        try:
+            fct = setup()
+            results[name] = time_function(fct,n_repeat,min_time,max_time)
+        except Exception as error:
+            results[name] = {"error":type(error).__name__+": "+str(error)}
+        if verbose:
+            print(format_line(name,results[name]))
+
+    return {"version":result_version,
+            "date":time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "machine":{"python":platform.python_version(),
+                       "numpy":numpy.__version__,
+                       "platform":platform.platform(),
+                       "processor":platform.processor()},
+            "results":results}
+
+
+#===========================================================================================================
+def save_results(results,file_path):
+
+    with open(file_path,"w") as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+
+    return
+
+
+#===========================================================================================================
+def load_results(file_path):
+
+    with open(file_path,"r") as file:
+        results = json.load(file)
+
+    if (results.get("version")!=result_version):
+        raise Exception("load_results, unsupported benchmark result version : "+file_path)
+
+    return results
+
+
+#===========================================================================================================
+def compare(results,baseline,tolerance=0.25):
+    """
+    Compare best times to a baseline, returns a dictionary {name : (status, ratio)}
+    status is "regression" if time > (1+tolerance)*baseline, "improvement" if time < baseline/(1+tolerance),
+    "ok" otherwise, "error" when the case failed, "new" when there is no baseline time
+    """
+
+    comparison = {}
+
+    for name,result in results["results"].items():
+        reference = baseline["results"].get(name)
+        if ("error" in result):
+            comparison[name] = ("error",None)
+        elif (reference is None or "error" in reference):
+            comparison[name] = ("new",None)
+        else:
+            ratio = result["best"]/reference["best"]
+            if ((1.+tolerance)<ratio):
+                comparison[name] = ("regression",ratio)
+            elif (ratio<1./(1.+tolerance)):
+                comparison[name] = ("improvement",ratio)
+            else:
+                comparison[name] = ("ok",ratio)
+
+    return comparison
+
+
+#===========================================================================================================
+def format_line(name,result,status=None):
+
+    if ("error" in result):
+        line = "%-40s %12s   %s" % (name,"error",result["error"])
+    else:
+        line = "%-40s %12.3e s  (median %.3e s, %d x %d calls)" % (name,result["best"],result["median"],
+                                                                    result["n_repeat"],result["n_loop"])
+    if (status is not None and status[1] is not None):
+        line += "   %s x%.2f" % status
+    elif (status is not None):
+        line += "   "+status[0]
+
+    return line
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="MARILib micro benchmarks")
+    parser.add_argument("--case", nargs="*", default=None, help="cases to run, all if not given")
+    parser.add_argument("--list", action="store_true", help="list cases and exit")
+    parser.add_argument("--output", default=None, help="JSON file where results are written")
+    parser.add_argument("--baseline", default=default_baseline, help="JSON result file to compare with")
+    parser.add_argument("--no-baseline", action="store_true", help="do not compare with a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="relative slow down flagged as regression")
+    parser.add_argument("--repeat", type=int, default=5, help="number of timed loops per case")
+    parser.add_argument("--min-time", type=float, default=0.05, help="minimum duration of one timed loop (s)")
+    args = parser.parse_args()
+
+    if args.no_baseline:
+        args.baseline = None
+
+    if args.list:
+        for name,setup in benchmark_cases():
+            print(name)
+        sys.exit(0)
+
+    results = run_benchmarks(args.case,args.repeat,args.min_time,verbose=(args.baseline is None))
+
+    if (args.output is not None):
+        save_results(results,args.output)
+
+    if (args.baseline is not None):
+        comparison = compare(results,load_results(args.baseline),args.tolerance)
+        for name,result in results["results"].items():
+            print(format_line(name,result,comparison[name]))
+        n_regression = len([status for status,ratio in comparison.values() if status=="regression"])
+        n_error = len([status for status,ratio in comparison.values() if status=="error"])
+        if (0<n_regression):
+            print("%d regression(s)" % n_regression)
+        if (0<n_error):
+            print("%d failed case(s)" % n_error)
+        if (0<n_regression or 0<n_error):
+            sys.exit(1)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jan 24 23:22:21 2019
+
+@author: DRUOT Thierry
+"""
+
+import numpy
+
+from collections import OrderedDict
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+class EvalCache(object):
+    """
+    Least recently used cache of a function evaluated on design vectors
+    """
+    def __init__(self, fct = None,
+                       max_size = 256,
+                       x_tol = None):
+        """
+        Constructor :
+            :param fct: Uu function - OoM 10^0 - Function of the design vector whose results are stored
+            :param max_size: Uu int - OoM 10^2 - Maximum number of stored evaluations, least recently used is dropped first
+            :param x_tol: Uu same as x - OoM any - Rounding step of the design vector in the key, None means exact key
+        """
+        self.fct = fct
+        self.max_size = max_size
+        self.x_tol = x_tol
+        self.n_hit = 0
+        self.n_miss = 0
+        self.data = OrderedDict()
+
+    def key(self,x_in):
+        """
+        Key of a design vector, exact values or values rounded to x_tol
+        """
+        x = numpy.asarray(x_in, dtype=float).ravel()
+        if (self.x_tol is None):
+            return x.tobytes()
+        else:
+            return numpy.round(x/self.x_tol).tobytes()
+
+    def __call__(self,x_in):
+        """
+        Return the stored result if any, evaluate and store it otherwise
+        """
+        k = self.key(x_in)
+        if k in self.data:
+            self.n_hit += 1
+            self.data.move_to_end(k)
+            return self.data[k]
+        self.n_miss += 1
+        res = self.fct(x_in)
+        self.data[k] = res
+        if (self.max_size<len(self.data)):
+            self.data.popitem(last=False)
+        return res
+
+    def clear(self):
+        """
+        Drop all stored evaluations and reset counters
+        """
+        self.data.clear()
+        self.n_hit = 0
+        self.n_miss = 0
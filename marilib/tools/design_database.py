@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jan 24 23:22:21 2019
+
+@author: DRUOT Thierry
+
+Columnar store of design histories (sweeps, optimization iterations)
+A database is a directory holding schema.json and one sub directory per column, each column is split into
+chunks saved as float64 .npy files : <path>/<column>/<chunk>.npy
+Rows are buffered in memory and written one chunk at a time, chunks are read with memory mapping so that
+filtering only touches the columns it uses
+A database without path keeps its chunks in memory
+"""
+
+import os
+import json
+
+import numpy
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+class ChunkColumns(dict):
+    """
+    Columns of one chunk, each column is memory mapped on first access
+    """
+    def __init__(self, database = None,
+                       chunk = None):
+        """
+        Constructor :
+            :param database: Uu DesignDatabase - OoM 10^0 - Database the chunk belongs to
+            :param chunk: Uu int - OoM 10^0 - Chunk number, None for the rows not yet written
+        """
+        dict.__init__(self)
+        self.database = database
+        self.chunk = chunk
+
+    def __missing__(self,name):
+        if name not in self.database.columns:
+            raise Exception("DesignDatabase, unknown column : "+name)
+        if (self.chunk is None):
+            column = numpy.array(self.database.buffer[name], dtype=float)
+        elif (self.database.path is None):
+            column = self.database.memory[self.chunk][name]
+        else:
+            column = numpy.load(self.database.chunk_file(name,self.chunk), mmap_mode="r")
+        self[name] = column
+        return column
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+class DesignDatabase(object):
+    """
+    Append only columnar store of float64 design data
+    """
+    def __init__(self, path = None,
+                       columns = None,
+                       chunk_size = 1024):
+        """
+        Constructor :
+            :param path: Uu string - OoM 10^0 - Database directory, opened if it exists, created on first write otherwise,
+                                                in memory database if None
+            :param columns: Uu list - OoM 10^1 - Column names, taken from the first appended row if None
+            :param chunk_size: Uu int - OoM 10^3 - Number of rows buffered in memory before a chunk is written
+            :param chunks: Uu list - OoM 10^0 - Number of rows of each written chunk
+            :param memory: Uu list - OoM 10^0 - Columns of each chunk of an in memory database
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self.columns = None
+        self.chunks = []
+        self.buffer = {}
+        self.n_buffer = 0
+        self.memory = []
+
+        if (path is not None and os.path.exists(os.path.join(path,"schema.json"))):
+            schema_file = os.path.join(path,"schema.json")
+            with open(schema_file,"r") as file:
+                schema = json.load(file)
+            self.define(schema["columns"])
+            self.chunks = schema["chunks"]
+            if (columns is not None and list(columns)!=self.columns):
+                raise Exception("DesignDatabase, columns do not match existing database : "+path)
+        elif (columns is not None):
+            self.define(columns)
+
+    def define(self,columns):
+        """
+        Set the columns of an empty database
+        """
+        if (self.columns is not None):
+            raise Exception("DesignDatabase, columns are already defined")
+        for name in columns:
+            if ("/" in name) or (os.sep in name) or (name in ("",".","..")):
+                raise Exception("DesignDatabase, invalid column name : "+name)
+        self.columns = list(columns)
+        self.buffer = {name:[] for name in self.columns}
+
+    def __len__(self):
+        return sum(self.chunks) + self.n_buffer
+
+    def chunk_file(self,name,chunk):
+        return os.path.join(self.path,name,"%06d.npy" % chunk)
+
+    def append(self,row):
+        """
+        Add one row given as a dictionary {column : value}, missing columns are set to NaN
+        """
+        if (self.columns is None):
+            self.define(row.keys())
+
+        for name in row:
+            if name not in self.buffer:
+                raise Exception("DesignDatabase, unknown column : "+name)
+
+        for name in self.columns:
+            self.buffer[name].append(row.get(name,numpy.nan))
+
+        self.n_buffer += 1
+
+        if (self.chunk_size<=self.n_buffer):
+            self.flush()
+
+    def extend(self,data):
+        """
+        Add several rows given as a dictionary {column : array of values}
+        """
+        if (self.columns is None):
+            self.define(data.keys())
+
+        n_row = max([numpy.size(value) for value in data.values()])
+
+        for name in data:
+            if name not in self.buffer:
+                raise Exception("DesignDatabase, unknown column : "+name)
+
+        for name in self.columns:
+            self.buffer[name].extend(numpy.broadcast_to(numpy.asarray(data.get(name,numpy.nan), dtype=float),(n_row,)))
+
+        self.n_buffer += n_row
+
+        if (self.chunk_size<=self.n_buffer):
+            self.flush()
+
+    def flush(self):
+        """
+        Write buffered rows as a new chunk and update the schema
+        """
+        if (self.n_buffer==0):
+            return
+
+        chunk = len(self.chunks)
+
+        if (self.path is None):
+            self.memory.append({name:numpy.array(self.buffer[name], dtype=float) for name in self.columns})
+            self.buffer = {name:[] for name in self.columns}
+            self.chunks.append(self.n_buffer)
+            self.n_buffer = 0
+            return
+
+        for name in self.columns:
+            os.makedirs(os.path.join(self.path,name), exist_ok=True)
+            numpy.save(self.chunk_file(name,chunk), numpy.array(self.buffer[name], dtype=float))
+            self.buffer[name] = []
+
+        self.chunks.append(self.n_buffer)
+        self.n_buffer = 0
+
+        # Schema is replaced in one step so that readers never see a partially written chunk
+        schema_file = os.path.join(self.path,"schema.json")
+        with open(schema_file+".tmp","w") as file:
+            json.dump({"version":1,"columns":self.columns,"chunks":self.chunks}, file)
+        os.replace(schema_file+".tmp",schema_file)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.flush()
+
+    def iter_chunks(self):
+        """
+        Yield the columns of each chunk, rows still in the buffer come last
+        """
+        for chunk in range(len(self.chunks)):
+            yield ChunkColumns(self,chunk)
+        if (0<self.n_buffer):
+            yield ChunkColumns(self,None)
+
+    def column(self,name):
+        """
+        Whole column as an array
+        """
+        data = [columns[name] for columns in self.iter_chunks()]
+        if (len(data)==0):
+            return numpy.zeros(0)
+        return numpy.concatenate(data)
+
+    def select(self,where=None,columns=None):
+        """
+        Rows satisfying a condition, as a dictionary {column : array}
+        where : function of the chunk columns returning a boolean mask,
+                for instance lambda c: (c["feasible"]==1.) & (c["weights.mtow"]<80000.), all rows if None
+        columns : returned columns, all columns if None
+        """
+        if (columns is None):
+            columns = self.columns if self.columns is not None else []
+
+        data = {name:[] for name in columns}
+
+        for chunk_columns in self.iter_chunks():
+            if (where is None):
+                mask = slice(None)
+            else:
+                mask = numpy.asarray(where(chunk_columns), dtype=bool)
+                if not mask.any():
+                    continue
+            for name in columns:
+                data[name].append(numpy.array(chunk_columns[name][mask]))
+
+        return {name:(numpy.concatenate(data[name]) if len(data[name])>0 else numpy.zeros(0)) for name in columns}
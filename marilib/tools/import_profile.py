@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jan 24 23:22:21 2019
+
+@author: DRUOT Thierry
+
+Import time of marilib modules, measured in fresh interpreters so that nothing is already loaded
+Usage : python -m marilib.tools.import_profile [module] [budget_in_seconds]
+"""
+
+import os
+import sys
+import subprocess
+
+
+# Module imported by worker processes of sweeps and design of experiments
+default_module = "marilib.processes.assembly"
+
+# Maximum import time of default_module in seconds
+default_budget = 1.0
+
+
+#===========================================================================================================
+def fresh_interpreter(code,options=()):
+    """
+    Run python code in a new interpreter that sees the same marilib package, returns stderr
+    """
+
+    package_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = package_dir + os.pathsep + env.get("PYTHONPATH","")
+
+    output = subprocess.run([sys.executable]+list(options)+["-c",code], env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+
+    if (output.returncode!=0):
+        raise Exception("fresh_interpreter, python failed :\n"+output.stderr)
+
+    return output.stderr
+
+
+#===========================================================================================================
+def import_times(module=default_module):
+    """
+    Import time of every module loaded by importing module, from python -X importtime
+    Returns a list of (name, self time, cumulative time) in seconds sorted by decreasing cumulative time
+    """
+
+    log = fresh_interpreter("import "+module, options=("-X","importtime"))
+
+    data = []
+    for line in log.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us,cumulative_us,name = line[len("import time:"):].split("|")
+        data.append((name.strip(), int(self_us)*1.e-6, int(cumulative_us)*1.e-6))
+
+    data.sort(key=lambda item: -item[2])
+
+    return data
+
+
+#===========================================================================================================
+def startup_time(module=default_module,n_repeat=5):
+    """
+    Wall time of the import of module in a fresh interpreter, best of n_repeat runs
+    """
+
+    code = "import time\nt0 = time.perf_counter()\nimport "+module+"\n" \
+           "import sys\nsys.stderr.write(repr(time.perf_counter()-t0))"
+
+    return min([float(fresh_interpreter(code)) for i in range(n_repeat)])
+
+
+#===========================================================================================================
+def check_startup_budget(module=default_module,budget=default_budget,n_repeat=5):
+    """
+    Raise an exception if the import of module takes more than budget seconds
+    """
+
+    t_import = startup_time(module,n_repeat)
+
+    if (budget<t_import):
+        raise Exception("check_startup_budget, import of "+module+" takes %.3f s, budget is %.3f s" % (t_import,budget))
+
+    return t_import
+
+
+#===========================================================================================================
+def report(module=default_module,n_line=20):
+    """
+    Import times as text, largest cumulative times first
+    """
+
+    lines = ["%-60s %10s %10s" % ("module","self (s)","total (s)")]
+
+    for name,self_time,cumulative_time in import_times(module)[:n_line]:
+        lines.append("%-60s %10.4f %10.4f" % (name,self_time,cumulative_time))
+
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+
+    module = sys.argv[1] if (1<len(sys.argv)) else default_module
+    budget = float(sys.argv[2]) if (2<len(sys.argv)) else default_budget
+
+    print(report(module))
+
+    t_import = check_startup_budget(module,budget)
+    print("import of %s : %.3f s, budget %.3f s" % (module,t_import,budget))
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jan 24 23:22:21 2019
+
+@author: DRUOT Thierry
+"""
+
+import numpy
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+class FdJacobian(object):
+    """
+    Central finite difference Jacobians, all points of the stencil are evaluated concurrently
+    """
+    def __init__(self, fct = None,
+                       args = (),
+                       rel_step = None,
+                       n_workers = None):
+        """
+        Constructor :
+            :param fct: Uu function - OoM 10^0 - Function fct(x,*args) returning a tuple of arrays, must be picklable
+            :param args: Uu tuple - OoM 10^0 - Additional arguments of fct, sent to the workers with each point
+            :param rel_step: Uu no_dim - OoM 10^-6 - Relative step, default is the one of scipy 3-point scheme
+            :param n_workers: Uu int - OoM 10^0 - Number of worker processes, default is the number of cores, 1 runs in the current process
+        """
+        self.fct = fct
+        self.args = args
+        if (rel_step is None):
+            self.rel_step = numpy.finfo(float).eps**(1./3.)
+        else:
+            self.rel_step = rel_step
+        self.n_workers = n_workers
+        self.n_eval = 0
+        self.pool = None
+        self.x_last = None
+        self.jac_last = None
+
+    def steps(self,x):
+        """
+        Perturbation of each variable
+        """
+        return self.rel_step*numpy.maximum(1.,numpy.abs(x))
+
+    def eval_points(self,x_list):
+        """
+        Evaluate fct on a list of points, concurrently if a pool is used
+        """
+        self.n_eval += len(x_list)
+        if (self.n_workers is not None and self.n_workers<=1):
+            return [self.fct(x,*self.args) for x in x_list]
+        if (self.pool is None):
+            from concurrent.futures import ProcessPoolExecutor
+            self.pool = ProcessPoolExecutor(max_workers=self.n_workers)
+        futures = [self.pool.submit(self.fct,x,*self.args) for x in x_list]
+        return [future.result() for future in futures]
+
+    def __call__(self,x_in):
+        """
+        Return the list of the Jacobians of each output of fct, shape (output size, x size)
+        The last stencil is kept so that several outputs can be derived from one single batch
+        """
+        x = numpy.asarray(x_in, dtype=float).ravel()
+
+        if (self.x_last is not None and numpy.array_equal(x,self.x_last)):
+            return self.jac_last
+
+        h = self.steps(x)
+        n = x.size
+
+        x_list = []
+        for i in range(n):
+            for sign in (1.,-1.):
+                xp = x.copy()
+                xp[i] += sign*h[i]
+                x_list.append(xp)
+
+        res = self.eval_points(x_list)
+
+        jac = []
+        for k in range(len(res[0])):
+            jk = numpy.zeros((numpy.size(res[0][k]),n))
+            for i in range(n):
+                dx = x_list[2*i][i] - x_list[2*i+1][i]
+                jk[:,i] = (numpy.ravel(res[2*i][k]) - numpy.ravel(res[2*i+1][k]))/dx
+            jac.append(jk)
+
+        self.x_last = x
+        self.jac_last = jac
+
+        return jac
+
+    def close(self):
+        """
+        Shut the worker pool down
+        """
+        if (self.pool is not None):
+            self.pool.shutdown()
+            self.pool = None
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jan 24 23:22:21 2019
+
+@author: DRUOT Thierry
+
+Opt-in instrumentation of discipline functions and solvers
+Functions are replaced by timing wrappers in their module when enable() is called and restored by disable(),
+so nothing is paid when profiling is off
+Each thread records its own call tree, report() merges them. Only the process that called enable() is profiled,
+calls made in worker processes (sweeps, parallel Jacobians, surrogate samples) are not recorded
+"""
+
+import time
+import types
+import functools
+import importlib
+import threading
+
+
+# Modules whose functions are instrumented by default
+default_modules = ("marilib.earth.environment",
+                   "marilib.airplane.airframe.airframe_design",
+                   "marilib.airplane.propulsion.propulsion_design",
+                   "marilib.airplane.propulsion.propulsion_models",
+                   "marilib.aircraft_model.airplane.aerodynamics",
+                   "marilib.aircraft_model.airplane.airplane_design",
+                   "marilib.aircraft_model.operations.mission",
+                   "marilib.aircraft_model.operations.flight_mechanics",
+                   "marilib.aircraft_model.operations.handling_qualities",
+                   "marilib.aircraft_model.operations.pricing_and_costing",
+                   "marilib.aircraft_model.operations.environmental_impact",
+                   "marilib.processes.component",
+                   "marilib.processes.assembly")
+
+# Solver functions imported by name into the instrumented modules
+solver_names = ("fsolve",)
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+class CallNode(object):
+    """
+    One node of the call tree
+    """
+    def __init__(self, name = None):
+        """
+        Constructor :
+            :param name: Uu string - OoM 10^0 - Function name, solver nodes are named solver(residual)
+            :param n_call: Uu int - OoM 10^2 - Number of calls
+            :param time: Uu s - OoM 10^0 - Accumulated wall time including children
+            :param nfev: Uu int - OoM 10^2 - Accumulated number of residual evaluations, solver nodes only
+            :param n_fail: Uu int - OoM 10^0 - Number of non converged solves, solver nodes only
+        """
+        self.name = name
+        self.n_call = 0
+        self.time = 0.
+        self.nfev = 0
+        self.n_fail = 0
+        self.children = {}
+
+    def child(self,name):
+        if name not in self.children:
+            self.children[name] = CallNode(name)
+        return self.children[name]
+
+    def self_time(self):
+        return self.time - sum([c.time for c in self.children.values()])
+
+
+# Profiling state : call tree roots of all threads, call stack of the current thread, patched functions
+roots = []
+local = threading.local()
+lock = threading.Lock()
+patches = []
+
+
+#===========================================================================================================
+def thread_stack():
+    """
+    Call stack of the current thread, its root is created at first call
+    """
+
+    stack = getattr(local,"stack",None)
+
+    if (stack is None):
+        root = CallNode("root")
+        with lock:
+            roots.append(root)
+        stack = local.stack = [root]
+
+    return stack
+
+
+#===========================================================================================================
+def timed_function(fct,name):
+    """
+    Wrap a function so that each call is recorded in the call tree
+    """
+
+    @functools.wraps(fct)
+    def wrapper(*args, **kwargs):
+        stack = thread_stack()
+        node = stack[-1].child(name)
+        stack.append(node)
+        t0 = time.perf_counter()
+        try:
+            return fct(*args, **kwargs)
+        finally:
+            node.time += time.perf_counter() - t0
+            node.n_call += 1
+            stack.pop()
+
+    return wrapper
+
+
+#===========================================================================================================
+def timed_solver(solver,solver_name):
+    """
+    Wrap a scipy solver, its node is named after the residual function and counts residual evaluations
+    and convergence failures
+    """
+
+    @functools.wraps(solver)
+    def wrapper(func, *args, **kwargs):
+        stack = thread_stack()
+        node = stack[-1].child(solver_name+"("+getattr(func,"__name__","?")+")")
+        stack.append(node)
+
+        def counted_func(*fargs, **fkwargs):
+            node.nfev += 1
+            return func(*fargs, **fkwargs)
+
+        t0 = time.perf_counter()
+        try:
+            output = solver(counted_func, *args, **kwargs)
+        finally:
+            node.time += time.perf_counter() - t0
+            node.n_call += 1
+            stack.pop()
+
+        if kwargs.get("full_output",False) and output[2]!=1:
+            node.n_fail += 1
+
+        return output
+
+    return wrapper
+
+
+#===========================================================================================================
+def enable(modules=default_modules):
+    """
+    Instrument all the functions defined in the given modules and the solvers they use
+    """
+
+    if (len(patches)>0):
+        raise Exception("profiling is already enabled")
+
+    for module_name in modules:
+        module = importlib.import_module(module_name)
+        short_name = module_name.split(".")[-1]
+        for name,obj in list(vars(module).items()):
+            if isinstance(obj,types.FunctionType) and obj.__module__==module_name:
+                patches.append((module,name,obj))
+                setattr(module,name,timed_function(obj,short_name+"."+name))
+            elif name in solver_names and callable(obj):
+                patches.append((module,name,obj))
+                setattr(module,name,timed_solver(obj,name))
+
+    return
+
+
+#===========================================================================================================
+def disable():
+    """
+    Restore original functions
+    """
+
+    while (len(patches)>0):
+        module,name,obj = patches.pop()
+        setattr(module,name,obj)
+
+    return
+
+
+#===========================================================================================================
+def reset():
+    """
+    Clear the call trees of all threads
+    """
+
+    with lock:
+        for root in roots:
+            root.children.clear()
+
+    del thread_stack()[1:]
+
+    return
+
+
+#===========================================================================================================
+def merged_tree():
+    """
+    Sum of the call trees of all threads
+    """
+
+    def merge(target,node):
+        target.n_call += node.n_call
+        target.time += node.time
+        target.nfev += node.nfev
+        target.n_fail += node.n_fail
+        for name,child in list(node.children.items()):
+            merge(target.child(name),child)
+
+    tree = CallNode("root")
+
+    with lock:
+        for root in roots:
+            merge(tree,root)
+
+    return tree
+
+
+#===========================================================================================================
+def report(min_time=0.):
+    """
+    Call tree as text : calls, total time, self time and solver statistics
+    Solver nodes are children of their calling function so that residual evaluations are given per call site
+    Nodes taking less than min_time seconds are not shown
+    """
+
+    root = merged_tree()
+
+    lines = ["%-60s %8s %10s %10s %8s %10s %6s" % ("function","calls","time (s)","self (s)","nfev","nfev/call","fail")]
+
+    def add_node(node,depth):
+        if (node.time<min_time):
+            return
+        name = "  "*depth + node.name
+        if (0<node.nfev):
+            lines.append("%-60s %8d %10.4f %10.4f %8d %10.1f %6d" % (name,node.n_call,node.time,node.self_time(),
+                                                                      node.nfev,node.nfev/max(1,node.n_call),node.n_fail))
+        else:
+            lines.append("%-60s %8d %10.4f %10.4f" % (name,node.n_call,node.time,node.self_time()))
+        for child in sorted(node.children.values(), key=lambda c: -c.time):
+            add_node(child,depth+1)
+
+    for child in sorted(root.children.values(), key=lambda c: -c.time):
+        add_node(child,0)
+
+    return "\n".join(lines)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jan 24 23:22:21 2019
+
+@author: DRUOT Thierry
+"""
+
+import numpy
+
+
+#===========================================================================================================
+def latin_hypercube(lower,upper,n_point,seed=None):
+    """
+    Space filling design of n_point points inside the box [lower,upper]
+    """
+
+    from scipy.stats import qmc
+    sampler = qmc.LatinHypercube(d=len(lower), seed=seed)
+
+    return qmc.scale(sampler.random(n_point), lower, upper)
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+class RbfSurrogate(object):
+    """
+    Radial basis function response surface of a vector valued function
+    """
+    def __init__(self, x_scale = None,
+                       kernel = "thin_plate_spline",
+                       smoothing = 0.):
+        """
+        Constructor :
+            :param x_scale: Uu same as x - OoM any - Normalization of each input, typically the search domain width
+            :param kernel: Uu string - OoM 10^0 - RBF kernel name, see scipy.interpolate.RBFInterpolator
+            :param smoothing: Uu no_dim - OoM 10^-6 - Smoothing parameter, 0 means interpolation
+        """
+        self.x_scale = numpy.asarray(x_scale, dtype=float)
+        self.kernel = kernel
+        self.smoothing = smoothing
+        self.interpolator = None
+
+    def fit(self,x_data,y_data):
+        """
+        Fit the surface on samples, x_data is (n_point,n_input) and y_data is (n_point,n_output)
+        """
+        from scipy.interpolate import RBFInterpolator
+        self.interpolator = RBFInterpolator(numpy.asarray(x_data)/self.x_scale, numpy.asarray(y_data),
+                                            kernel=self.kernel, smoothing=self.smoothing, degree=1)
+
+    def __call__(self,x_in):
+        """
+        Predicted outputs at one single point
+        """
+        return self.interpolator(numpy.atleast_2d(x_in)/self.x_scale)[0]
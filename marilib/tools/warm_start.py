@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jan 24 23:22:21 2019
+
+@author: DRUOT Thierry
+"""
+
+import numpy
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+class WarmStart(object):
+    """
+    Converged coupling variables of successive solves, used to seed new solves from the nearest design
+    Statistics count the residual evaluations of all solves and of warm started solves separately so that the
+    saving of warm starts can be measured against the cold solves of the same run
+    """
+    def __init__(self, enabled = False,
+                       max_size = 256):
+        """
+        Constructor :
+            :param enabled: Uu bool - OoM 10^0 - If False, guesses are not modified and nothing is recorded
+            :param max_size: Uu int - OoM 10^2 - Maximum number of stored solutions per solver, oldest is dropped first
+        """
+        self.enabled = enabled
+        self.max_size = max_size
+        self.data = {}
+        self.stats = {}
+        self.warm = {}
+
+    def guess(self,name,key,x_ini):
+        """
+        Return the solution stored for the nearest key, x_ini if none or if the store is disabled
+        Distance is measured relatively to the magnitude of each key component
+        """
+        if not self.enabled:
+            return x_ini
+
+        stat = self.stats.setdefault(name,{"n_solve":0,"n_warm":0,"n_fail":0,"nfev":0,"nfev_warm":0})
+        stat["n_solve"] += 1
+
+        self.warm[name] = (name in self.data)
+
+        if not self.warm[name]:
+            return x_ini
+
+        keys,solutions = self.data[name]
+        key = numpy.asarray(key, dtype=float)
+        scale = numpy.maximum(numpy.abs(key),numpy.finfo(float).tiny)
+        dist = numpy.sum(((numpy.array(keys)-key)/scale)**2, axis=1)
+
+        # Last minimum is taken so that ties go to the most recent solution
+        i = len(dist) - 1 - numpy.argmin(dist[::-1])
+
+        stat["n_warm"] += 1
+
+        return solutions[i].copy()
+
+    def record(self,name,key,output_dict):
+        """
+        Store the solution of a fsolve call made with full_output=True and update statistics,
+        the call is expected to start from the last guess of the same name, nothing is done if the store is disabled
+        """
+        if not self.enabled:
+            return
+
+        stat = self.stats.setdefault(name,{"n_solve":0,"n_warm":0,"n_fail":0,"nfev":0,"nfev_warm":0})
+        stat["nfev"] += output_dict[1]["nfev"]
+        if self.warm.get(name,False):
+            stat["nfev_warm"] += output_dict[1]["nfev"]
+
+        if (output_dict[2]!=1):
+            stat["n_fail"] += 1
+            return
+
+        keys,solutions = self.data.setdefault(name,([],[]))
+        keys.append(numpy.array(key, dtype=float))
+        solutions.append(numpy.array(output_dict[0], dtype=float))
+        if (self.max_size<len(keys)):
+            del keys[0]
+            del solutions[0]
+
+    def mean_nfev(self,name,warm=None):
+        """
+        Mean number of residual evaluations per solve, of warm started solves only if warm is True,
+        of cold solves only if warm is False
+        """
+        stat = self.stats[name]
+        if (warm is None):
+            return stat["nfev"]/max(1,stat["n_solve"])
+        elif warm:
+            return stat["nfev_warm"]/max(1,stat["n_warm"])
+        else:
+            return (stat["nfev"]-stat["nfev_warm"])/max(1,stat["n_solve"]-stat["n_warm"])
+
+    def clear(self):
+        """
+        Drop all stored solutions and statistics
+        """
+        self.data.clear()
+        self.stats.clear()
+        self.warm.clear()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jan 24 23:22:21 2019
+
+@author: DRUOT Thierry
+"""
+
+import numpy
+
+from marilib.tools.design_database import DesignDatabase
+
+
+#===========================================================================================================
+def fill(database):
+
+    for i in range(5):
+        database.append({"x":float(i), "y":float(i*i)})
+    database.extend({"x":numpy.array([5.,6.]), "y":numpy.array([25.,36.])})
+
+    return database
+
+
+#===========================================================================================================
+def test_in_memory_database():
+
+    database = fill(DesignDatabase(chunk_size=3))
+
+    assert database.path is None
+    assert len(database) == 7
+    assert database.chunks == [3,4]
+
+    assert numpy.array_equal(database.column("y"), numpy.arange(7.)**2)
+
+    data = database.select(lambda c: 10.<c["y"], ["x"])
+    assert numpy.array_equal(data["x"], [4.,5.,6.])
+
+    database.append({"x":7.})
+    database.flush()
+    assert numpy.isnan(database.column("y")[-1])
+
+
+#===========================================================================================================
+def test_database_directory(tmp_path):
+
+    path = str(tmp_path / "designs")
+
+    with DesignDatabase(path, chunk_size=3) as database:
+        fill(database)
+
+    database = DesignDatabase(path)
+
+    assert len(database) == 7
+    assert numpy.array_equal(database.column("x"), numpy.arange(7.))
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jan 24 23:22:21 2019
+
+@author: DRUOT Thierry
+"""
+
+from marilib.tools import import_profile
+
+
+#===========================================================================================================
+def test_assembly_startup_budget():
+
+    t_import = import_profile.check_startup_budget("marilib.processes.assembly",
+                                                   import_profile.default_budget, n_repeat=3)
+
+    assert 0. < t_import
+
+
+#===========================================================================================================
+def test_assembly_does_not_load_optional_dependencies():
+
+    names = [name for name,self_time,cumulative_time in import_profile.import_times("marilib.processes.assembly")]
+
+    assert "marilib.processes.assembly" in names
+    assert not [name for name in names if name.split(".")[0] in ("matplotlib","configobj")]
+    assert "marilib.aircraft_model.airplane.viewer" not in names
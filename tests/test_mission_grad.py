@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jan 24 23:22:21 2019
+
+@author: DRUOT Thierry
+"""
+
+import numpy
+
+from marilib.aircraft_model.operations import mission as perfo, mission_grad as perfo_grad
+
+from marilib.processes import assembly as run
+
+from marilib.tools import benchmark
+
+
+#===========================================================================================================
+def test_mission_grad_matches_mission():
+
+    aircraft = benchmark.evaluated_aircraft()
+
+    dist_range = aircraft.design_driver.design_range
+    altp = aircraft.design_driver.ref_cruise_altp
+    mach = aircraft.design_driver.cruise_mach
+    tow = aircraft.weights.mtow
+    tow_d = numpy.array([1.,0.,0.])
+    dtow = 1.
+
+    block_fuel,block_fuel_d, time_block,time_block_d, fuel_total,fuel_total_d \
+        = perfo_grad.mission_grad(aircraft,dist_range,tow,tow_d,altp,mach,0.)
+
+    value = perfo.mission(aircraft,dist_range,tow,altp,mach,0.)
+    value_p = perfo.mission(aircraft,dist_range,tow+dtow,altp,mach,0.)
+    value_m = perfo.mission(aircraft,dist_range,tow-dtow,altp,mach,0.)
+
+    assert numpy.allclose((block_fuel,time_block,fuel_total), value, rtol=1.e-12)
+
+    for x_d,x_p,x_m in zip((block_fuel_d,time_block_d,fuel_total_d),value_p,value_m):
+        assert numpy.allclose(x_d, tow_d*(x_p-x_m)/(2.*dtow), rtol=1.e-6, atol=1.e-9)
+
+
+#===========================================================================================================
+def test_mass_mission_fprime_matches_finite_differences(monkeypatch):
+
+    aircraft = benchmark.evaluated_aircraft()
+
+    calls = []
+
+    def fsolve(func, x0, args=(), fprime=None, **kwargs):
+        if (fprime is not None and func.__name__=="fct_mass_mission"):
+            calls.append((func,fprime,numpy.array(x0, dtype=float),args))
+        return fsolve_ref(func, x0=x0, args=args, fprime=fprime, **kwargs)
+
+    fsolve_ref = run.fsolve
+    monkeypatch.setattr(run, "fsolve", fsolve)
+
+    run.eval_mass_mission_adaptation(aircraft)
+
+    func,fprime,x0,args = calls[0]
+
+    jac = fprime(x0,args)
+
+    step = 1.e-4*numpy.abs(x0)
+    jac_fd = numpy.zeros((len(x0),len(x0)))
+    for j in range(len(x0)):
+        dx = numpy.zeros(len(x0))
+        dx[j] = step[j]
+        jac_fd[:,j] = (func(x0+dx,args) - func(x0-dx,args))/(2.*step[j])
+
+    assert numpy.allclose(jac, jac_fd, rtol=1.e-4, atol=1.e-6)
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jan 24 23:22:21 2019
+
+@author: DRUOT Thierry
+"""
+
+import threading
+
+from marilib.earth import environment as earth
+
+from marilib.tools import profiling
+
+
+#===========================================================================================================
+def test_threads_record_separate_trees():
+
+    profiling.reset()
+    profiling.enable(("marilib.earth.environment",))
+
+    def run():
+        for i in range(100):
+            earth.atmosphere(10000.,0.)
+            earth.altg_from_altp(1000.,0.)
+
+    try:
+        threads = [threading.Thread(target=run) for k in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        profiling.disable()
+
+    tree = profiling.merged_tree()
+
+    assert tree.children["environment.atmosphere"].n_call == 400
+
+    solver = tree.children["environment.altg_from_altp"].children["fsolve(fct_altg_from_altp)"]
+    assert solver.n_call == 400
+    assert 400 <= solver.nfev
+
+    assert "fsolve(fct_altg_from_altp)" in profiling.report()
+
+    profiling.reset()
+    assert profiling.merged_tree().children == {}
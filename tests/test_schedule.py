@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jan 24 23:22:21 2019
+
+@author: DRUOT Thierry
+"""
+
+import copy
+
+import numpy
+
+from marilib.tools import units as unit, benchmark
+
+from marilib.aircraft_model.operations import pricing_and_costing as costing
+
+from marilib.processes import schedule, component
+
+
+#===========================================================================================================
+def test_unfeasible_sector_is_left_out_of_totals():
+
+    aircraft = benchmark.evaluated_aircraft()
+
+    sectors = numpy.zeros(3, dtype=[("range",float),("payload",float),("n_flight",float)])
+    sectors["range"] = [500., 2000., 9000.]
+    sectors["payload"] = [12000., 12000., 12000.]
+    sectors["n_flight"] = [10., 5., 2.]
+
+    result,total = schedule.eval_schedule(aircraft,sectors)
+
+    assert list(result["feasible"]) == [True, True, False]
+
+    feasible = schedule.eval_schedule(aircraft,sectors[0:2])[1]
+
+    for name in ("n_flight","distance","payload_distance","block_fuel","block_time","block_CO2",
+                 "cash_op_cost","direct_op_cost"):
+        assert numpy.isclose(total[name], feasible[name])
+
+    assert total["n_unfeasible"] == 2.
+    assert numpy.isclose(total["unfeasible_distance"], 2.*9000.*1852.)
+    assert numpy.isclose(total["unfeasible_payload_distance"], 2.*12000.*9000.*1852.)
+    assert feasible["n_unfeasible"] == 0.
+
+
+#===========================================================================================================
+def test_schedule_matches_sector_loop():
+
+    aircraft = benchmark.evaluated_aircraft()
+
+    sectors = numpy.zeros(5, dtype=[("range",float),("payload",float),("disa",float),("altp",float),("mach",float),
+                                    ("n_flight",float)])
+    sectors["range"] = [300., 800., 1500., 2500., 1500.]
+    sectors["payload"] = [9000., 15000., 12000., 15000., 12000.]
+    sectors["disa"] = [0., 0., 15., 0., 15.]
+    sectors["altp"] = [31000., 35000., 35000., 35000., 35000.]
+    sectors["mach"] = [0.76, 0.78, 0.78, 0.78, 0.78]
+    sectors["n_flight"] = [4., 3., 2., 1., 2.]
+
+    result,total = schedule.eval_schedule(aircraft,sectors)
+
+    block_fuel_sum = 0.
+    direct_op_cost_sum = 0.
+
+    for k,sector in enumerate(sectors):
+        ac = copy.deepcopy(aircraft)
+        dist_range = unit.m_NM(sector["range"])
+        altp = unit.m_ft(sector["altp"])
+
+        tow,block_fuel,block_time,total_fuel \
+            = component.mission_tow(ac,sector["payload"],dist_range,altp,sector["mach"],sector["disa"])
+
+        ac.cost_mission.range = dist_range
+        direct_op_cost,cash_op_cost,battery_price,gear_price,engine_price,aircraft_price \
+            = costing.eval_operating_costs(ac,block_fuel,block_time)
+
+        assert result["feasible"][k]
+        assert numpy.isclose(result["tow"][k], tow, rtol=1.e-10)
+        assert numpy.isclose(result["block_fuel"][k], block_fuel, rtol=1.e-10)
+        assert numpy.isclose(result["block_time"][k], block_time, rtol=1.e-10)
+        assert numpy.isclose(result["total_fuel"][k], total_fuel, rtol=1.e-10)
+        assert numpy.isclose(result["cash_op_cost"][k], cash_op_cost, rtol=1.e-10)
+        assert numpy.isclose(result["direct_op_cost"][k], direct_op_cost, rtol=1.e-10)
+
+        block_fuel_sum += sector["n_flight"]*block_fuel
+        direct_op_cost_sum += sector["n_flight"]*direct_op_cost
+
+    assert numpy.isclose(total["block_fuel"], block_fuel_sum, rtol=1.e-10)
+    assert numpy.isclose(total["direct_op_cost"], direct_op_cost_sum, rtol=1.e-10)
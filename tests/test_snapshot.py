@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jan 24 23:22:21 2019
+
+@author: DRUOT Thierry
+"""
+
+import numpy
+
+from marilib.aircraft_data import snapshot
+
+from marilib.tools import benchmark
+
+
+#===========================================================================================================
+def test_append_evaluated_after_fresh_aircraft(tmp_path):
+
+    path = str(tmp_path / "aircraft.snap")
+
+    fresh = benchmark.reference_aircraft()
+    evaluated = benchmark.evaluated_aircraft()
+
+    assert fresh.propulsion.rating_code is None
+
+    snapshot.write_snapshot(path, fresh)
+    snapshot.append_snapshot(path, evaluated)
+
+    fresh_read,evaluated_read = snapshot.read_snapshot(path)
+
+    assert fresh_read.propulsion.rating_code is None
+    assert evaluated_read.propulsion.rating_code == evaluated.propulsion.rating_code
+    assert evaluated_read.turbofan_engine.rating_factor == evaluated.turbofan_engine.rating_factor
+    assert evaluated_read.propulsion.architecture == 1
+    assert isinstance(evaluated_read.cabin.n_pax_front, int)
+    assert evaluated_read.weights.mtow == evaluated.weights.mtow
+    assert fresh_read.wing.area == fresh.wing.area
+    assert fresh_read.nominal_mission.payload is None
+    assert evaluated_read.nominal_mission.payload == evaluated.nominal_mission.payload
+
+    schema,payload,column = snapshot.open_snapshot(path)
+    assert payload.shape == (2, snapshot.n_column(snapshot.make_schema()))
+    assert numpy.isnan(payload[0,column["nominal_mission.payload"]])
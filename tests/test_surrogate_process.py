@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jan 24 23:22:21 2019
+
+@author: DRUOT Thierry
+"""
+
+import io
+import contextlib
+
+import numpy
+
+from marilib.processes import assembly as run
+
+from marilib.tools import benchmark
+
+
+search_domain = ((110000,140000),(120,160))
+
+
+#===========================================================================================================
+def surrogate_process(max_iter):
+
+    aircraft = benchmark.reference_aircraft()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        res = run.mdf_surrogate_process(aircraft,search_domain,"MTOW",n_sample=4,n_workers=1,max_iter=max_iter)
+
+    return aircraft,res
+
+
+#===========================================================================================================
+def test_no_iteration():
+
+    aircraft,res = surrogate_process(0)
+
+    assert res.nit == 0
+    assert not res.success
+    assert res.nfev == 5
+    assert numpy.allclose(res.x, (aircraft.turbofan_engine.reference_thrust,aircraft.wing.area))
+
+
+#===========================================================================================================
+def test_few_iterations():
+
+    aircraft,res = surrogate_process(2)
+
+    assert 1 <= res.nit <= 2
+    assert numpy.all(numpy.array([b[0] for b in search_domain]) <= res.x)
+    assert numpy.all(res.x <= numpy.array([b[1] for b in search_domain]))
+    assert 5 <= res.nfev
+    assert numpy.allclose(res.x, (aircraft.turbofan_engine.reference_thrust,aircraft.wing.area))
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jan 24 23:22:21 2019
+
+@author: DRUOT Thierry
+"""
+
+import numpy
+
+from scipy.optimize import fsolve
+
+from marilib.tools.warm_start import WarmStart
+
+
+#===========================================================================================================
+def solve(store,a):
+
+    x_ini = store.guess("root",[a],numpy.array([1.]))
+    output_dict = fsolve(lambda x: x**3 - a, x0=x_ini, full_output=True)
+    store.record("root",[a],output_dict)
+
+    return output_dict[0][0]
+
+
+#===========================================================================================================
+def test_disabled_store_records_nothing():
+
+    store = WarmStart(enabled=False)
+
+    for a in (8.,8.1):
+        assert abs(solve(store,a)**3 - a) < 1.e-8
+
+    assert store.data == {}
+    assert store.stats == {}
+
+
+#===========================================================================================================
+def test_enabled_store_counts_residual_evaluations():
+
+    store = WarmStart(enabled=True)
+
+    for a in (1000.,1000.1,1000.2):
+        assert abs(solve(store,a)**3 - a) < 1.e-6
+
+    stat = store.stats["root"]
+    assert (stat["n_solve"],stat["n_warm"],stat["n_fail"]) == (3,2,0)
+    assert 0 < stat["nfev_warm"] < stat["nfev"]
+    assert store.mean_nfev("root",True) < store.mean_nfev("root",False)